@@ -0,0 +1,27 @@
+from collections import namedtuple
+
+# Действия правил — единое описание для WaterTreatmentSimulator.apply_action(),
+# Монте-Карло (monte_carlo.py) и службы принятия решений (service.py).
+
+# record — тип записи в таблице actions; variable, delta — изменяемая величина
+# и приращение; intensity, duration — параметры воздействия по умолчанию
+# (без нечеткого вывода); ph_correction — интенсивность задает доза pH;
+# description — сообщение о примененном действии
+Action = namedtuple('Action', 'record variable delta intensity duration ph_correction description')
+
+ACTIONS = {
+    'activate_chemical_treatment': Action('chemical_treatment', 'pollution_level', -0.3, 0.8, 10, False,
+                                          'Усиленная химическая очистка'),
+    'activate_standard_treatment': Action('standard_treatment', 'pollution_level', -0.15, 0.5, 8, False,
+                                          'Стандартная очистка'),
+    'activate_minimal_treatment': Action('minimal_treatment', 'pollution_level', -0.05, 0.2, 5, False,
+                                         'Минимальная очистка'),
+    'add_alkaline': Action('add_alkaline', 'ph_level', 0.3, 0.4, 3, True, 'Добавление щелочи'),
+    'add_acid': Action('add_acid', 'ph_level', -0.3, 0.4, 3, True, 'Добавление кислоты'),
+}
+
+# Величины, ограничиваемые допустимым диапазоном сразу после действия
+ACTION_CLAMPED = ('pollution_level', 'ph_level')
+
+# Запись в actions, когда ни одно правило не сработало
+NO_ACTION = 'no_action'
@@ -0,0 +1,105 @@
+import sqlite3
+import time
+from types import MappingProxyType
+
+from rules import RuleSet
+
+# Каталог онтологии и правил: читается из базы один раз и хранится в памяти
+# в неизменяемом виде. Перечитывается, только если изменился счетчик
+# catalog_version (его увеличивают триггеры на таблицах ontology и rules).
+
+_CATALOG_TABLES = ('ontology', 'rules')
+
+
+def install_catalog_version(conn):
+    """
+    Счетчик изменений каталога: триггеры увеличивают его при любой
+    вставке, изменении или удалении строк ontology и rules.
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS catalog_version (version INTEGER NOT NULL)')
+    conn.execute('INSERT INTO catalog_version (version) '
+                 'SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM catalog_version)')
+    for table in _CATALOG_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} '
+                         'BEGIN UPDATE catalog_version SET version = version + 1; END')
+
+
+def catalog_version(conn):
+    """Текущее значение счетчика изменений каталога (None — счетчика нет в базе)"""
+    try:
+        row = conn.execute('SELECT version FROM catalog_version').fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+class Catalog:
+    """
+    Неизменяемый снимок онтологии и правил.
+    ontology — понятие -> свойство -> значение; rules — строки таблицы rules
+    (id, name, condition, action, priority), упорядоченные по приоритету;
+    rule_set — скомпилированные правила.
+    """
+
+    __slots__ = ('version', 'ontology', 'rules', 'rule_set')
+
+    def __init__(self, ontology_rows, rule_rows, version=None):
+        ontology = {}
+        for concept, prop, value in ontology_rows:
+            ontology.setdefault(concept, {})[prop] = value
+        self.version = version
+        self.ontology = MappingProxyType({concept: MappingProxyType(props) for concept, props in ontology.items()})
+        self.rules = tuple(sorted((tuple(row) for row in rule_rows), key=lambda r: (r[4], r[0])))
+        self.rule_set = RuleSet(self.rules)
+
+    @classmethod
+    def from_db(cls, conn):
+        version = catalog_version(conn)
+        ontology_rows = conn.execute('SELECT concept, property, value FROM ontology ORDER BY id').fetchall()
+        rule_rows = conn.execute('SELECT id, name, condition, action, priority FROM rules').fetchall()
+        return cls(ontology_rows, rule_rows, version)
+
+    def value(self, concept, prop):
+        """Значение свойства понятия, например value('ph_level', 'neutral') -> 7.0"""
+        return self.ontology[concept][prop]
+
+
+class CatalogCache:
+    """
+    Каталог текущей базы. По умолчанию (check_interval=0) изменения проверяются
+    при каждом вызове get() одним коротким запросом к счетчику версии, поэтому
+    правка правил или онтологии видна сразу. check_interval > 0 — проверка
+    не чаще раза в check_interval секунд (правка может быть видна с задержкой).
+    Снимок перечитывается, только если изменился счетчик catalog_version;
+    если счетчика в базе нет — по PRAGMA data_version.
+    """
+
+    def __init__(self, database, check_interval=0):
+        self.database = database
+        self.check_interval = check_interval
+        self._catalog = None
+        self._version = None
+        self._checked = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self._catalog is not None and now - self._checked < self.check_interval:
+            return self._catalog
+        conn = self.database.connection()
+        version = catalog_version(conn)
+        if version is None:
+            version = ('data_version', conn.execute('PRAGMA data_version').fetchone()[0])
+        if self._catalog is None or version != self._version:
+            catalog = Catalog.from_db(conn)
+            # тот же снимок сохраняется, если содержимое не изменилось
+            if self._catalog is None or catalog.rules != self._catalog.rules \
+                    or catalog.ontology != self._catalog.ontology:
+                self._catalog = catalog
+            self._version = version
+        self._checked = now
+        return self._catalog
+
+    def invalidate(self):
+        """Следующий get() перечитает каталог из базы"""
+        self._catalog = None
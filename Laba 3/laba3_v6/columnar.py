@@ -0,0 +1,228 @@
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+from storage import MEASUREMENT_COLUMNS
+
+# Выгрузка таблиц measurements и actions в столбцовый формат для анализа:
+# каталог на таблицу, в нем по файлу .npy на столбец и meta.json.
+# Таблица читается из SQLite частями, и каждая часть сразу дописывается
+# в файлы столбцов, поэтому выгрузка идет в постоянной памяти при любом
+# числе строк. Чтение отображает файлы в память (np.load с mmap_mode)
+# без копирования. Если установлен pyarrow, можно выгрузить таблицу
+# в файл Arrow IPC (format='arrow').
+
+# Столбцы выгрузки: (имя, тип NumPy, выражение SQL).
+# Все выражения числовые, поэтому часть строк преобразуется в массив одним вызовом.
+TABLE_COLUMNS = {
+    'measurements': [
+        ('id', 'int64', 'id'),
+        ('timestamp', 'datetime64[s]', "CAST(strftime('%s', timestamp) AS INTEGER)"),
+    ] + [(name, 'float64', name) for name in MEASUREMENT_COLUMNS],
+    'actions': [
+        ('id', 'int64', 'id'),
+        ('timestamp', 'datetime64[s]', "CAST(strftime('%s', timestamp) AS INTEGER)"),
+        ('action_type', 'int16', None),  # номер в списке категорий, -1 — NULL
+        ('intensity', 'float64', 'intensity'),
+        ('duration', 'int32', 'COALESCE(duration, -1)'),
+    ],
+}
+
+# Текстовые столбцы, которые кодируются номерами категорий
+CATEGORY_COLUMNS = {'actions': ('action_type',)}
+
+
+def _connect_readonly(db_path):
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + '?mode=ro', uri=True)
+
+
+class _NpyWriter:
+    """Файлы .npy столбцов: заголовок с числом строк, затем данные дописываются частями"""
+
+    def __init__(self, directory, columns, rows):
+        self.files = {}
+        for name, dtype in columns:
+            f = open(directory / f'{name}.npy', 'wb')
+            np.lib.format.write_array_header_2_0(f, {
+                'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                'fortran_order': False,
+                'shape': (rows,)
+            })
+            self.files[name] = f
+
+    def write(self, block):
+        for name, values in block.items():
+            self.files[name].write(np.ascontiguousarray(values).tobytes())
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+class _ArrowWriter:
+    """Файл Arrow IPC: одна запись (record batch) на часть таблицы"""
+
+    def __init__(self, directory, columns, rows):
+        import pyarrow as pa
+        import pyarrow.ipc
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.from_numpy_dtype(np.dtype(dtype))) for name, dtype in columns])
+        self.sink = pa.OSFile(str(directory / 'table.arrow'), 'wb')
+        self.writer = pa.ipc.new_file(self.sink, self.schema)
+
+    def write(self, block):
+        self.writer.write_batch(self.pa.record_batch(
+            [self.pa.array(block[name]) for name in self.schema.names], schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+
+WRITERS = {'npy': _NpyWriter, 'arrow': _ArrowWriter}
+
+
+def export_table(db_path, table, out_dir, chunk_size=65536, format='npy'):
+    """
+    Выгружает таблицу table базы db_path в каталог out_dir/table.
+    Подсчет строк и чтение выполняются в одной транзакции, поэтому
+    параллельная запись в базу не нарушает согласованность выгрузки.
+    Возвращает число выгруженных строк.
+    """
+    directory = Path(out_dir) / table
+    directory.mkdir(parents=True, exist_ok=True)
+    meta_path = directory / 'meta.json'
+    if meta_path.exists():
+        meta_path.unlink()  # незавершенная выгрузка не должна выглядеть готовой
+
+    conn = _connect_readonly(db_path)
+    try:
+        conn.execute('BEGIN')
+        categories = {}
+        expressions = []
+        for name, dtype, expression in TABLE_COLUMNS[table]:
+            if name in CATEGORY_COLUMNS.get(table, ()):
+                values = [row[0] for row in conn.execute(
+                    f'SELECT DISTINCT {name} FROM {table} WHERE {name} IS NOT NULL ORDER BY {name}')]
+                categories[name] = values
+                cases = ' '.join(f'WHEN ? THEN {i}' for i in range(len(values)))
+                expression = f'CASE {name} {cases} ELSE -1 END' if values else '-1'
+            expressions.append(expression)
+        params = [value for name in categories for value in categories[name]]
+        rows = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+        columns = [(name, dtype) for name, dtype, _ in TABLE_COLUMNS[table]]
+        writer = WRITERS[format](directory, columns, rows)
+        written = 0
+        try:
+            cursor = conn.execute(f'SELECT {", ".join(expressions)} FROM {table} ORDER BY id', params)
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                data = np.array(chunk, dtype=float)
+                block = {}
+                for i, (name, dtype) in enumerate(columns):
+                    if dtype.startswith('datetime64'):
+                        # NULL (NaN) -> NaT; остальные значения — целые секунды
+                        valid = ~np.isnan(data[:, i])
+                        block[name] = np.full(len(data), np.datetime64('NaT'), dtype=dtype)
+                        block[name][valid] = data[valid, i].astype(np.int64).astype(dtype)
+                    else:
+                        block[name] = data[:, i].astype(dtype)
+                writer.write(block)
+                written += len(chunk)
+        finally:
+            writer.close()
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if written != rows:
+        raise RuntimeError(f"Таблица {table}: ожидалось {rows} строк, выгружено {written}")
+    meta = {
+        'table': table,
+        'rows': rows,
+        'format': format,
+        'columns': {name: dtype for name, dtype in columns},
+        'categories': categories,
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return rows
+
+
+def export_database(db_path, out_dir, tables=('measurements', 'actions'), chunk_size=65536, format='npy'):
+    """Выгружает таблицы базы; возвращает {таблица: число строк}"""
+    return {table: export_table(db_path, table, out_dir, chunk_size, format) for table in tables}
+
+
+class ColumnarTable:
+    """
+    Выгруженная таблица. table['ph_level'] — столбец NumPy, отображенный
+    в память без копирования (для формата arrow — без копирования, если
+    таблица записана одной частью). decode('action_type') — текстовые значения.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'meta.json', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.columns = tuple(self.meta['columns'])
+        self._cache = {}
+        self._arrow = None
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def _arrow_reader(self):
+        if self._arrow is None:
+            import pyarrow as pa
+            import pyarrow.ipc
+            self._arrow = pa.ipc.open_file(pa.memory_map(str(self.path / 'table.arrow'), 'r'))
+        return self._arrow
+
+    def __getitem__(self, name):
+        if name not in self.meta['columns']:
+            raise KeyError(name)
+        column = self._cache.get(name)
+        if column is None:
+            if self.meta['format'] == 'npy':
+                column = np.load(self.path / f'{name}.npy', mmap_mode='r')
+            else:
+                column = self._arrow_reader().read_all().column(name).to_numpy()
+            self._cache[name] = column
+        return column
+
+    def decode(self, name):
+        """Текстовые значения закодированного столбца (None для NULL)"""
+        categories = np.array(self.meta['categories'][name] + [None], dtype=object)
+        return categories[self[name]]
+
+    def iter_chunks(self, columns=None, chunk_size=1 << 20):
+        """Части таблицы: словари срезов столбцов по chunk_size строк (без копирования)"""
+        columns = columns or self.columns
+        for start in range(0, len(self), chunk_size):
+            yield {name: self[name][start:start + chunk_size] for name in columns}
+
+
+def open_table(out_dir, table):
+    return ColumnarTable(Path(out_dir) / table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Столбцовая выгрузка измерений и действий Laba3")
+    parser.add_argument("db", nargs="?", default="water_treatment.db")
+    parser.add_argument("out", nargs="?", default="water_treatment_columns")
+    parser.add_argument("--tables", nargs="+", choices=sorted(TABLE_COLUMNS), default=['measurements', 'actions'])
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    parser.add_argument("--format", choices=sorted(WRITERS), default='npy',
+                        help="npy — файл на столбец, arrow — Arrow IPC (нужен pyarrow)")
+    args = parser.parse_args()
+
+    for table, rows in export_database(args.db, args.out, args.tables, args.chunk_size, args.format).items():
+        data = open_table(args.out, table)
+        size = sum(f.stat().st_size for f in data.path.iterdir())
+        print(f"{table}: {rows} строк, {size / 1e6:.1f} МБ в {data.path}")
@@ -0,0 +1,247 @@
+import importlib.util
+import os
+import sys
+
+import numpy as np
+
+
+def _load_membership():
+    """
+    Библиотека функций принадлежности общая с Laba2 (Laba2/Lab2_SII_s7/membership.py):
+    модуль загружается по пути относительно этого файла, sys.path не меняется.
+    """
+    if 'membership' in sys.modules:
+        return sys.modules['membership']
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                        'Laba2', 'Lab2_SII_s7', 'membership.py')
+    spec = importlib.util.spec_from_file_location('membership', os.path.normpath(path))
+    module = importlib.util.module_from_spec(spec)
+    # регистрация до выполнения — как при обычном импорте (нужна и для pickle)
+    sys.modules['membership'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+get_mf = _load_membership().get_mf
+
+# Нечеткий вывод (Мамдани или Сугено) для массивов состояний:
+# фаззификация входов по термам онтологии, правила с min/max,
+# дефаззификация центром тяжести на заранее вычисленных сетках выходов.
+
+# Области определения входных переменных (до этих границ тянутся крайние термы)
+INPUT_DOMAINS = {
+    'pollution_level': (0.0, 1.0),
+    'ph_level': (4.0, 9.0),
+    'temperature': (5.0, 35.0),
+    'oxygen_level': (1.0, 10.0),
+}
+
+# Выходные переменные: (нижняя граница, верхняя граница, значение, если ни одно
+# правило не сработало, термы с параметрами трапеций (a, b, c, d))
+OUTPUT_VARIABLES = {
+    'treatment_intensity': (0.0, 1.0, 0.0, {
+        'low': (0.0, 0.2, 0.2, 0.4),
+        'medium': (0.3, 0.5, 0.5, 0.7),
+        'high': (0.6, 0.8, 0.8, 1.0),
+    }),
+    'treatment_duration': (0.0, 15.0, 0.0, {
+        'short': (2.0, 5.0, 5.0, 7.0),
+        'medium': (6.0, 8.0, 8.0, 10.0),
+        'long': (9.0, 10.0, 12.0, 15.0),
+    }),
+    'ph_dose': (-0.6, 0.6, 0.0, {
+        'acid': (-0.6, -0.4, -0.4, -0.1),
+        'none': (-0.15, 0.0, 0.0, 0.15),
+        'alkaline': (0.1, 0.4, 0.4, 0.6),
+    }),
+}
+
+# Нечеткие правила: (связка 'and'/'or', {вход: терм}, {выход: терм})
+FUZZY_RULES = [
+    ('and', {'pollution_level': 'critical'}, {'treatment_intensity': 'high', 'treatment_duration': 'long'}),
+    ('and', {'pollution_level': 'high'}, {'treatment_intensity': 'high', 'treatment_duration': 'medium'}),
+    ('and', {'pollution_level': 'medium'}, {'treatment_intensity': 'medium', 'treatment_duration': 'medium'}),
+    ('and', {'pollution_level': 'low'}, {'treatment_intensity': 'low', 'treatment_duration': 'short'}),
+    # в холодной воде реакции идут медленнее — очистка дольше
+    ('and', {'pollution_level': 'high', 'temperature': 'cold'}, {'treatment_duration': 'long'}),
+    ('or', {'pollution_level': 'critical', 'oxygen_level': 'low'}, {'treatment_intensity': 'high'}),
+    ('and', {'ph_level': 'acidic'}, {'ph_dose': 'alkaline'}),
+    ('and', {'ph_level': 'neutral'}, {'ph_dose': 'none'}),
+    ('and', {'ph_level': 'alkaline'}, {'ph_dose': 'acid'}),
+]
+
+
+def rule_text(rule):
+    """Запись нечеткого правила для сообщений: 'ph_level=acidic -> ph_dose=alkaline'"""
+    connective, antecedent, consequent = rule
+    condition = f' {connective} '.join(f'{name}={term}' for name, term in antecedent.items())
+    return condition + ' -> ' + ', '.join(f'{name}={term}' for name, term in consequent.items())
+
+
+def trapezoid_mf(a, b, c, d):
+    """
+    Трапеция с плечами: a == b или c == d — принадлежность 1 на границе, вне [a, d] — 0.
+    Кусочно-линейная функция по вершинам из общего реестра.
+    """
+    xp, fp = (a, b, c, d), (0.0, 1.0, 1.0, 0.0)
+    if c == d:
+        xp, fp = xp[:3], fp[:3]
+    if a == b:
+        xp, fp = xp[1:], fp[1:]
+    return get_mf('piecewise', xp, fp)
+
+
+def trapezoid(x, a, b, c, d):
+    """Значения трапеции с плечами для массива x"""
+    return trapezoid_mf(a, b, c, d)(x)
+
+
+def terms_from_points(points, low, high):
+    """
+    Термы переменной по опорным точкам онтологии ({терм: значение}):
+    вершина терма — его значение, основания — соседние точки,
+    крайние термы — плечи до границ области [low, high].
+    """
+    names = sorted(points, key=points.get)
+    values = [points[name] for name in names]
+    terms = {}
+    for i, name in enumerate(names):
+        left = values[i - 1] if i > 0 else low
+        right = values[i + 1] if i + 1 < len(values) else high
+        core_left = min(low, values[i]) if i == 0 else values[i]
+        core_right = max(high, values[i]) if i + 1 == len(values) else values[i]
+        terms[name] = (min(left, core_left), core_left, core_right, max(right, core_right))
+    return terms
+
+
+class FuzzyInferenceSystem:
+    """
+    Система нечеткого вывода над массивами состояний.
+    input_terms — {переменная: {терм: (a, b, c, d)}}; rules — список FUZZY_RULES;
+    method — 'mamdani' (центр тяжести агрегированного множества)
+    или 'sugeno' (взвешенное среднее центров термов-следствий).
+    Сетки и значения термов выходных переменных вычисляются один раз при создании
+    (в float32: для центра тяжести этой точности достаточно, а проход по сетке вдвое дешевле).
+    Правила, ссылающиеся на отсутствующий входной терм (например, удаленный из онтологии),
+    пропускаются, как и ошибочные четкие правила; причины — в errors.
+    """
+
+    def __init__(self, input_terms, rules=FUZZY_RULES, outputs=OUTPUT_VARIABLES,
+                 method='mamdani', resolution=201):
+        if method not in ('mamdani', 'sugeno'):
+            raise ValueError(f"Неизвестный метод вывода: {method}")
+        self.input_terms = input_terms
+        self.method = method
+        # Одинаковые термы разных переменных используют общий вычислитель
+        self.input_mfs = {name: {term: trapezoid_mf(*params) for term, params in terms.items()}
+                          for name, terms in input_terms.items()}
+
+        self.rules = []
+        self.errors = {}  # запись правила -> причина пропуска
+        for rule in rules:
+            connective, antecedent, consequent = rule
+            if connective not in ('and', 'or'):
+                raise ValueError(f"Неизвестная связка: {connective}")
+            for name, term in consequent.items():
+                if name not in outputs or term not in outputs[name][3]:
+                    raise ValueError(f"Нет терма {term} у выходной переменной {name}")
+            missing = [f'{term} у {name}' for name, term in antecedent.items()
+                       if term not in input_terms.get(name, {})]
+            if missing:
+                self.errors[rule_text(rule)] = f"нет терма {', '.join(missing)}"
+            else:
+                self.rules.append(rule)
+
+        # Кэш сеток: выход -> (сетка, матрица термов на сетке, центры термов,
+        # значение по умолчанию, номера правил и термов-следствий)
+        self.outputs = {}
+        for name, (low, high, default, terms) in outputs.items():
+            term_names = list(terms)
+            grid = np.linspace(low, high, resolution, dtype=np.float32)
+            matrix = np.array([trapezoid_mf(*terms[t])(grid) for t in term_names], dtype=np.float32)
+            centers = np.array([(terms[t][1] + terms[t][2]) / 2 for t in term_names])
+            # выход без правил (все пропущены) получает значение по умолчанию
+            links = [(r, term_names.index(rule[2][name])) for r, rule in enumerate(self.rules) if name in rule[2]]
+            self.outputs[name] = (grid, matrix, centers, default, links)
+
+    @classmethod
+    def from_ontology(cls, ontology, **kwargs):
+        """Термы входных переменных по онтологии: {понятие: {свойство: значение}}"""
+        input_terms = {}
+        for concept, terms in ontology.items():
+            low, high = INPUT_DOMAINS.get(concept, (min(terms.values()), max(terms.values())))
+            input_terms[concept] = terms_from_points(dict(terms), low, high)
+        return cls(input_terms, **kwargs)
+
+    @classmethod
+    def from_db(cls, conn, **kwargs):
+        """Термы входных переменных по таблице ontology (concept, property, value)"""
+        points = {}
+        for concept, prop, value in conn.execute('SELECT concept, property, value FROM ontology'):
+            points.setdefault(concept, {})[prop] = value
+        return cls.from_ontology(points, **kwargs)
+
+    def fuzzify(self, columns):
+        """Степени принадлежности: {переменная: {терм: массив}} для переменных из правил"""
+        used = {name for _, antecedent, _ in self.rules for name in antecedent}
+        return {name: {term: mf(np.atleast_1d(columns[name])) for term, mf in self.input_mfs[name].items()}
+                for name in used}
+
+    def firing_strengths(self, columns):
+        """Степени срабатывания правил: массив (число состояний x число правил)"""
+        memberships = self.fuzzify(columns)
+        strengths = []
+        for connective, antecedent, _ in self.rules:
+            degrees = [memberships[name][term] for name, term in antecedent.items()]
+            combine = np.minimum if connective == 'and' else np.maximum
+            strength = degrees[0]
+            for degree in degrees[1:]:
+                strength = combine(strength, degree)
+            strengths.append(strength)
+        if not strengths:
+            return np.zeros((len(np.atleast_1d(next(iter(columns.values())))), 0))
+        return np.column_stack(strengths)
+
+    def infer(self, columns, chunk_size=8192):
+        """
+        Четкие значения выходов для блока состояний (словарь столбцов NumPy):
+        {выход: массив}. Мамдани считается частями по chunk_size строк,
+        чтобы агрегированные множества на сетке не занимали много памяти.
+        """
+        strengths = self.firing_strengths(columns)
+        n = len(strengths)
+        results = {}
+        for name, (grid, matrix, centers, default, links) in self.outputs.items():
+            rule_index = [r for r, _ in links]
+            term_index = np.array([t for _, t in links], dtype=np.int64)
+            if self.method == 'sugeno':
+                weights = strengths[:, rule_index]
+                total = weights.sum(axis=1)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    results[name] = np.where(total > 0, weights @ centers[term_index] / total, default)
+                continue
+            # Степень каждого терма-следствия — максимум по правилам (агрегация max)
+            term_strengths = np.zeros((n, len(matrix)))
+            for column, t in zip(rule_index, term_index):
+                np.maximum(term_strengths[:, t], strengths[:, column], out=term_strengths[:, t])
+            term_strengths = term_strengths.astype(np.float32)
+            out = np.empty(n)
+            buffer = np.empty((min(n, chunk_size), len(grid)), dtype=np.float32)
+            work = np.empty_like(buffer)
+            for start in range(0, n, chunk_size):
+                block = term_strengths[start:start + chunk_size]
+                aggregated, scratch = buffer[:len(block)], work[:len(block)]
+                # Импликация min и агрегация max на сетке
+                np.minimum(block[:, 0, None], matrix[0], out=aggregated)
+                for t in range(1, len(matrix)):
+                    np.minimum(block[:, t, None], matrix[t], out=scratch)
+                    np.maximum(aggregated, scratch, out=aggregated)
+                area = aggregated.sum(axis=1)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    out[start:start + chunk_size] = np.where(area > 0, aggregated @ grid / area, default)
+            results[name] = out
+        return results
+
+    def infer_one(self, measurements):
+        """Четкие выходы для одного состояния: {выход: число}"""
+        return {name: float(values[0]) for name, values in self.infer(measurements).items()}
@@ -0,0 +1,227 @@
+import atexit
+import cProfile
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# Необязательный сбор метрик: время и число вызовов основных функций,
+# срабатывания правил, гистограммы времени; выгрузка в JSON или
+# текстовый формат Prometheus. По умолчанию выключен: обертка проверяет
+# один флаг и сразу вызывает исходную функцию.
+# Включение из окружения: LABA3_METRICS=<файл .json или .prom> —
+# метрики собираются с самого начала и выгружаются при выходе.
+
+# Верхние границы корзин гистограмм времени, секунды
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+           1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = False
+_lock = threading.Lock()
+_histograms = {}  # имя -> [число по корзинам (+ последняя «больше всех»), сумма, число]
+_counters = {}    # (имя, метки) -> число
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(name, seconds):
+    """Добавляет длительность в гистограмму name"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        histogram[0][bisect_left(BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+def increment(name, value=1, **labels):
+    """Увеличивает счетчик name; labels — метки, например rule=<имя правила>"""
+    key = name, tuple(sorted(labels.items()))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def timed(name):
+    """Декоратор: время и число вызовов функции попадают в гистограмму name"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def timer(name):
+    """Контекстный менеджер для замера участка кода"""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def _quantile(counts, total, q):
+    """Оценка квантиля по корзинам (верхняя граница корзины)"""
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(counts):
+        seen += count
+        if seen >= rank and count:
+            return BUCKETS[i] if i < len(BUCKETS) else float('inf')
+    return 0.0
+
+
+def snapshot():
+    """Текущие значения метрик в виде словаря"""
+    with _lock:
+        histograms = {name: (list(counts), total, count) for name, (counts, total, count) in _histograms.items()}
+        counters = dict(_counters)
+    result = {'histograms': {}, 'counters': {}}
+    for name, (counts, total, count) in sorted(histograms.items()):
+        result['histograms'][name] = {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0.0,
+            'p50': _quantile(counts, count, 0.5),
+            'p99': _quantile(counts, count, 0.99),
+            'buckets': dict(zip([str(b) for b in BUCKETS] + ['+Inf'], counts))
+        }
+    for (name, labels), value in sorted(counters.items()):
+        result['counters'].setdefault(name, []).append(dict(labels, value=value))
+    return result
+
+
+def _prometheus_text(data):
+    def escape(text):
+        return text.replace('\\', '\\\\').replace('"', '\\"')
+
+    lines = []
+    for name, histogram in data['histograms'].items():
+        metric = f'laba3_{name}_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        cumulative = 0
+        for bound, count in histogram['buckets'].items():
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_sum {histogram["sum"]}')
+        lines.append(f'{metric}_count {histogram["count"]}')
+    for name, values in data['counters'].items():
+        metric = f'laba3_{name}_total'
+        lines.append(f'# TYPE {metric} counter')
+        for entry in values:
+            labels = ','.join(f'{key}="{escape(str(label))}"' for key, label in entry.items() if key != 'value')
+            lines.append(f'{metric}{{{labels}}} {entry["value"]}' if labels else f'{metric} {entry["value"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def export(path):
+    """Записывает снимок метрик: .prom — формат Prometheus, иначе JSON"""
+    data = snapshot()
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.prom'):
+            f.write(_prometheus_text(data))
+        else:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+@contextmanager
+def profile(path=None):
+    """Профилирование участка через cProfile с записью в path (None — без профилирования)"""
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+def benchmark_overhead(steps=20000):
+    """
+    Накладные расходы обертки на горячем пути: evaluate_conditions + save_measurement
+    без обертки, с выключенными и с включенными метриками. Возвращает мкс на шаг.
+    """
+    # импорт здесь: water_system сам импортирует этот модуль; при запуске
+    # файла как программы переключать нужно именно импортированный модуль
+    import metrics as registry
+    from water_system import WaterTreatmentSimulator, InferenceEngine
+
+    was_enabled = registry.enabled()
+    state = {'pollution_level': 0.5, 'water_flow': 100.0, 'ph_level': 7.0,
+             'temperature': 20.0, 'oxygen_level': 5.0}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        simulator = WaterTreatmentSimulator(os.path.join(tmp, 'bench.db'), batch_size=1000,
+                                            flush_interval=float('inf'))
+        engine = simulator.inference_engine
+        evaluate = InferenceEngine.evaluate_conditions
+        save = WaterTreatmentSimulator.save_measurement
+        variants = {
+            'baseline': (evaluate.__wrapped__, save.__wrapped__, False),
+            'disabled': (evaluate, save, False),
+            'enabled': (evaluate, save, True),
+        }
+        for _ in range(2):  # первый проход — прогрев
+            for variant, (evaluate_func, save_func, on) in variants.items():
+                registry.enable() if on else registry.disable()
+                start = time.perf_counter()
+                for i in range(steps):
+                    state['pollution_level'] = (i % 100) / 100
+                    evaluate_func(engine, state)
+                    save_func(simulator, state)
+                results[variant] = (time.perf_counter() - start) / steps * 1e6
+        registry.enable() if was_enabled else registry.disable()
+        simulator.close()
+    registry.reset()
+    return results
+
+
+if os.environ.get('LABA3_METRICS'):
+    enable()
+    atexit.register(export, os.environ['LABA3_METRICS'])
+
+
+if __name__ == "__main__":
+    timings = benchmark_overhead()
+    for variant, micros in timings.items():
+        print(f"{variant}: {micros:.2f} мкс/шаг")
+    print(f"Накладные расходы выключенных метрик: "
+          f"{(timings['disabled'] / timings['baseline'] - 1) * 100:+.1f} %")
+    print(f"Накладные расходы включенных метрик: "
+          f"{(timings['enabled'] / timings['baseline'] - 1) * 100:+.1f} %")
@@ -0,0 +1,242 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from actions import ACTIONS, ACTION_CLAMPED, NO_ACTION
+from rules import RuleSet
+from storage import Database, MEASUREMENT_COLUMNS
+
+# Быстрая симуляция методом Монте-Карло: много независимых сценариев
+# продвигаются одновременно как массивы NumPy, без вывода на экран и записи в базу.
+# Динамика та же, что в WaterTreatmentSimulator.apply_action()
+# и simulate_environment_change().
+
+# Начальное состояние (как в WaterTreatmentSimulator)
+INITIAL_STATE = {
+    'pollution_level': 0.5,
+    'water_flow': 100.0,
+    'ph_level': 7.0,
+    'temperature': 20.0,
+    'oxygen_level': 5.0
+}
+
+# Действие правила -> (изменяемая величина, приращение)
+ACTION_EFFECTS = {name: (action.variable, action.delta) for name, action in ACTIONS.items()}
+
+# Случайные изменения среды за шаг: величина -> (нижняя, верхняя граница приращения)
+ENVIRONMENT_DRIFT = {
+    'pollution_level': (-0.1, 0.15),
+    'ph_level': (-0.2, 0.2),
+    'temperature': (-1, 1),
+    'oxygen_level': (-0.5, 0.5),
+}
+
+# Допустимые диапазоны величин
+BOUNDS = {
+    'pollution_level': (0.0, 1.0),
+    'ph_level': (4.0, 9.0),
+    'temperature': (5.0, 35.0),
+    'oxygen_level': (1.0, 10.0),
+}
+
+
+def _column_arrays(names):
+    """Номера столбцов и массивы границ для набора величин"""
+    index = np.array([MEASUREMENT_COLUMNS.index(name) for name in names])
+    low = np.array([BOUNDS[name][0] for name in names])
+    high = np.array([BOUNDS[name][1] for name in names])
+    return index, low, high
+
+
+def action_table(rule_set):
+    """
+    Матрица приращений состояния для каждого правила набора (строка на правило
+    и последняя нулевая строка — «ни одно правило не сработало»).
+    """
+    deltas = np.zeros((len(rule_set) + 1, len(MEASUREMENT_COLUMNS)))
+    for i, rule in enumerate(rule_set.rules):
+        if rule.action in ACTION_EFFECTS:
+            name, delta = ACTION_EFFECTS[rule.action]
+            deltas[i, MEASUREMENT_COLUMNS.index(name)] = delta
+    return deltas
+
+
+def initial_states(scenarios, rng, initial_state=None, randomize=False):
+    """
+    Начальные состояния сценариев (scenarios x величины).
+    randomize=True — ограниченные величины выбираются равномерно в своих диапазонах.
+    """
+    state = dict(INITIAL_STATE, **(initial_state or {}))
+    states = np.tile([state[name] for name in MEASUREMENT_COLUMNS], (scenarios, 1)).astype(float)
+    if randomize:
+        index, low, high = _column_arrays(list(BOUNDS))
+        states[:, index] = rng.uniform(low, high, size=(scenarios, len(index)))
+    return states
+
+
+def simulate_batch(rule_set, states, steps, rng, trace=0):
+    """
+    Продвигает все сценарии (строки states) на steps шагов.
+    На каждом шаге: правило с наивысшим приоритетом, его действие,
+    затем случайное изменение среды. Возвращает словарь агрегатов
+    и траектории первых trace сценариев (trace x steps x величины).
+    """
+    states = np.array(states, dtype=float)
+    n = len(states)
+    actions = [rule.action for rule in rule_set.rules] + [NO_ACTION]
+    deltas = action_table(rule_set)
+    clamp_index, clamp_low, clamp_high = _column_arrays(ACTION_CLAMPED)
+    drift_names = list(ENVIRONMENT_DRIFT)
+    drift_index, drift_bounds_low, drift_bounds_high = _column_arrays(drift_names)
+    drift_low = np.array([ENVIRONMENT_DRIFT[name][0] for name in drift_names])
+    drift_high = np.array([ENVIRONMENT_DRIFT[name][1] for name in drift_names])
+
+    counts = np.zeros(len(actions), dtype=np.int64)
+    total = np.zeros(len(MEASUREMENT_COLUMNS))
+    total_sq = np.zeros(len(MEASUREMENT_COLUMNS))
+    minimum = np.full(len(MEASUREMENT_COLUMNS), np.inf)
+    maximum = np.full(len(MEASUREMENT_COLUMNS), -np.inf)
+    trajectories = np.empty((min(trace, n), steps, len(MEASUREMENT_COLUMNS)))
+
+    for step in range(steps):
+        # Измерение (состояние до решения), как в run_simulation()
+        total += states.sum(axis=0)
+        total_sq += (states * states).sum(axis=0)
+        np.minimum(minimum, states.min(axis=0), out=minimum)
+        np.maximum(maximum, states.max(axis=0), out=maximum)
+        trajectories[:, step] = states[:len(trajectories)]
+
+        columns = {name: states[:, i] for i, name in enumerate(MEASUREMENT_COLUMNS)}
+        winners = rule_set.evaluate_batch(columns)
+        counts += np.bincount(winners, minlength=len(actions))
+        states += deltas[winners]
+        states[:, clamp_index] = np.clip(states[:, clamp_index], clamp_low, clamp_high)
+
+        states[:, drift_index] += rng.uniform(drift_low, drift_high, size=(n, len(drift_names)))
+        states[:, drift_index] = np.clip(states[:, drift_index], drift_bounds_low, drift_bounds_high)
+
+    return {
+        'scenarios': n,
+        'steps': steps,
+        'actions': actions,
+        'action_counts': counts,
+        'sum': total,
+        'sum_sq': total_sq,
+        'min': minimum,
+        'max': maximum,
+        'final': states,
+        'trajectories': trajectories
+    }
+
+
+def merge_results(results):
+    """Объединяет агрегаты нескольких пакетов сценариев"""
+    first = results[0]
+    counts = {}
+    for result in results:
+        for action, count in zip(result['actions'], result['action_counts']):
+            counts[action] = counts.get(action, 0) + int(count)
+    samples = sum(r['scenarios'] for r in results) * first['steps']
+    mean = sum(r['sum'] for r in results) / samples
+    std = np.sqrt(np.maximum(sum(r['sum_sq'] for r in results) / samples - mean ** 2, 0.0))
+    final = np.concatenate([r['final'] for r in results])
+    trajectories = np.concatenate([r['trajectories'] for r in results])
+    return {
+        'scenarios': sum(r['scenarios'] for r in results),
+        'steps': first['steps'],
+        'action_counts': counts,
+        'mean': dict(zip(MEASUREMENT_COLUMNS, mean)),
+        'std': dict(zip(MEASUREMENT_COLUMNS, std)),
+        'min': dict(zip(MEASUREMENT_COLUMNS, np.minimum.reduce([r['min'] for r in results]))),
+        'max': dict(zip(MEASUREMENT_COLUMNS, np.maximum.reduce([r['max'] for r in results]))),
+        'final_mean': dict(zip(MEASUREMENT_COLUMNS, final.mean(axis=0))),
+        'final_percentiles': {name: np.percentile(final[:, i], [5, 50, 95])
+                              for i, name in enumerate(MEASUREMENT_COLUMNS)},
+        'trajectories': trajectories
+    }
+
+
+# Набор правил рабочего процесса (компилируется один раз на процесс)
+_worker_rules = None
+
+
+def _init_worker(rule_rows):
+    global _worker_rules
+    _worker_rules = RuleSet(rule_rows)
+
+
+def _run_batch(batch, scenarios, steps, seed, initial_state, randomize, trace):
+    # Свой генератор на пакет: результат не зависит от числа процессов
+    rng = np.random.default_rng([seed, batch])
+    states = initial_states(scenarios, rng, initial_state, randomize)
+    return simulate_batch(_worker_rules, states, steps, rng, trace)
+
+
+def run_monte_carlo(rule_rows, scenarios=1000, steps=1000, batch_size=1000, seed=0,
+                    initial_state=None, randomize=False, trace=0, workers=1):
+    """
+    Моделирует scenarios независимых сценариев по steps шагов.
+    rule_rows — строки таблицы rules (id, name, condition, action, priority).
+    Сценарии делятся на пакеты по batch_size; при workers > 1 пакеты
+    считаются в пуле процессов. trace — сколько первых сценариев
+    сохранить целиком в виде траекторий.
+    """
+    if scenarios <= 0:
+        raise ValueError("Число сценариев должно быть положительным")
+    if batch_size <= 0:
+        raise ValueError("Размер пакета должен быть положительным")
+    if steps <= 0:
+        raise ValueError("Число шагов должно быть положительным")
+    rule_rows = [tuple(row) for row in rule_rows]
+    sizes = [min(batch_size, scenarios - start) for start in range(0, scenarios, batch_size)]
+    tasks = [(batch, size, steps, seed, initial_state, randomize,
+              max(0, min(size, trace - batch * batch_size)))
+             for batch, size in enumerate(sizes)]
+    if workers == 1:
+        _init_worker(rule_rows)
+        results = [_run_batch(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(rule_rows,)) as pool:
+            results = list(pool.map(_run_batch, *zip(*tasks)))
+    return merge_results(results)
+
+
+def load_rule_rows(db_path):
+    """Строки таблицы rules из базы"""
+    database = Database(db_path, wal=False)
+    try:
+        return database.connection().execute(
+            'SELECT id, name, condition, action, priority FROM rules ORDER BY priority').fetchall()
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Моделирование множества сценариев очистных сооружений")
+    parser.add_argument("--db", default="water_treatment.db", help="база с таблицей правил")
+    parser.add_argument("--scenarios", type=int, default=10000)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--random-initial", action="store_true",
+                        help="случайные начальные состояния в допустимых диапазонах")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = run_monte_carlo(load_rule_rows(args.db), args.scenarios, args.steps, args.batch_size,
+                              args.seed, randomize=args.random_initial, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"Сценариев: {summary['scenarios']}, шагов: {summary['steps']}, "
+          f"время: {elapsed:.2f} с ({summary['scenarios'] * summary['steps'] / elapsed:.0f} шагов/с)")
+    print("Действия:")
+    for action, count in sorted(summary['action_counts'].items(), key=lambda item: -item[1]):
+        print(f"  {action}: {count}")
+    print("Величины (среднее ± ст. откл., итоговые 5/50/95 %):")
+    for name in MEASUREMENT_COLUMNS:
+        p5, p50, p95 = summary['final_percentiles'][name]
+        print(f"  {name}: {summary['mean'][name]:.3f} ± {summary['std'][name]:.3f}; "
+              f"{p5:.3f} / {p50:.3f} / {p95:.3f}")
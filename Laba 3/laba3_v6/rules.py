@@ -0,0 +1,429 @@
+import ast
+import operator
+from bisect import bisect_left, bisect_right
+from functools import lru_cache, reduce
+
+import numpy as np
+
+
+class RuleSyntaxError(ValueError):
+    """Условие правила содержит недопустимую конструкцию"""
+
+
+# Допустимые операции сравнения
+_COMPARISONS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+
+def _constant(node):
+    """Числовая константа (с учетом унарного минуса) или None."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _constant(node.operand)
+        if value is not None:
+            return -value if isinstance(node.op, ast.USub) else value
+    return None
+
+
+def _compile_node(node, variables, vector=False):
+    """
+    Превращает узел AST в замыкание f(measurements).
+    vector=True — вариант для столбцов NumPy: логические операции
+    выполняются поэлементно и результат — булев массив.
+    """
+    value = _constant(node)
+    if value is not None:
+        return lambda m: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        variables.add(name)
+        return lambda m: m[name]
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile_node(v, variables, vector) for v in node.values]
+        if vector:
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return lambda m: reduce(combine, [p(m) for p in parts])
+        if isinstance(node.op, ast.And):
+            if len(parts) == 2:
+                left, right = parts
+                return lambda m: left(m) and right(m)
+            return lambda m: all(p(m) for p in parts)
+        if len(parts) == 2:
+            left, right = parts
+            return lambda m: left(m) or right(m)
+        return lambda m: any(p(m) for p in parts)
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile_node(node.operand, variables, vector)
+        if vector:
+            return lambda m: np.logical_not(operand(m))
+        return lambda m: not operand(m)
+
+    if isinstance(node, ast.Compare):
+        if not all(type(op) in _COMPARISONS for op in node.ops):
+            raise RuleSyntaxError("Недопустимая операция сравнения")
+        operands = [_compile_node(v, variables, vector) for v in [node.left] + node.comparators]
+        ops = [_COMPARISONS[type(op)] for op in node.ops]
+        if len(ops) == 1:
+            left, right = operands
+            op = ops[0]
+            return lambda m: op(left(m), right(m))
+
+        def chain(m):
+            # цепочка сравнений: a < b <= c
+            values = [f(m) for f in operands]
+            if vector:
+                return reduce(np.logical_and, [op(values[i], values[i + 1]) for i, op in enumerate(ops)])
+            return all(op(values[i], values[i + 1]) for i, op in enumerate(ops))
+        return chain
+
+    raise RuleSyntaxError(f"Недопустимая конструкция: {type(node).__name__}")
+
+
+# Кэши разбора условий ограничены: отредактированные и удаленные правила
+# не должны накапливаться в памяти долго работающего процесса
+@lru_cache(maxsize=4096)
+def compile_condition(condition, vector=False):
+    """
+    Разбирает текст условия один раз и возвращает (функция, переменные).
+    Разрешены только числа, имена измерений, сравнения и and/or/not.
+    vector=True — функция принимает словарь столбцов NumPy и возвращает маску.
+    """
+    try:
+        tree = ast.parse(condition, mode="eval")
+    except SyntaxError as e:
+        raise RuleSyntaxError(str(e)) from None
+    variables = set()
+    test = _compile_node(tree.body, variables, vector)
+    return test, frozenset(variables)
+
+
+@lru_cache(maxsize=4096)
+def condition_thresholds(condition):
+    """
+    Пороги, с которыми условие сравнивает переменные: словарь имя -> множество чисел.
+    None, если условие содержит сравнения, не сводящиеся к «переменная op число»
+    (например, сравнение двух переменных), или переменную вне сравнения
+    (проверка истинности «pollution_level and ...») — его истинность нельзя
+    описать интервалами, и такое правило пересчитывается при любом изменении.
+    """
+    tree = ast.parse(condition, mode="eval")
+    compared = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Compare):
+            compared.update(id(operand) for operand in [node.left] + node.comparators)
+    if any(isinstance(node, ast.Name) and id(node) not in compared for node in ast.walk(tree)):
+        return None
+
+    thresholds = {}
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Compare):
+            continue
+        operands = [node.left] + node.comparators
+        for left, right in zip(operands, operands[1:]):
+            for name, other in ((left, right), (right, left)):
+                if isinstance(name, ast.Name):
+                    value = _constant(other)
+                    if value is None:
+                        return None
+                    thresholds.setdefault(name.id, set()).add(value)
+    return thresholds
+
+
+class CompiledRule:
+    """Правило с заранее скомпилированным условием"""
+
+    __slots__ = ("id", "name", "condition", "action", "priority", "test", "variables", "_mask")
+
+    def __init__(self, rule_id, name, condition, action, priority):
+        self.id = rule_id
+        self.name = name
+        self.condition = condition
+        self.action = action
+        self.priority = priority
+        self.test, self.variables = compile_condition(condition)
+        self._mask = None
+
+    def mask(self, columns):
+        """Булева маска срабатывания правила для блока измерений (словарь столбцов)."""
+        if self._mask is None:
+            self._mask, _ = compile_condition(self.condition, vector=True)
+        n = len(next(iter(columns.values())))
+        return np.broadcast_to(self._mask(columns), (n,))
+
+    def as_dict(self):
+        return {'id': self.id, 'name': self.name, 'action': self.action, 'priority': self.priority}
+
+
+class RuleSet:
+    """Скомпилированный набор правил, упорядоченный по приоритету"""
+
+    def __init__(self, rows):
+        self.rules = []
+        self.errors = {}  # имя правила -> ошибка компиляции
+        for rule_id, name, condition, action, priority in rows:
+            try:
+                self.rules.append(CompiledRule(rule_id, name, condition, action, priority))
+            except RuleSyntaxError as e:
+                self.errors[name] = e
+        self.rules.sort(key=lambda r: (r.priority, r.id))
+
+    @classmethod
+    def from_db(cls, conn):
+        cursor = conn.execute('SELECT id, name, condition, action, priority FROM rules ORDER BY priority')
+        return cls(cursor.fetchall())
+
+    def __len__(self):
+        return len(self.rules)
+
+    def evaluate(self, measurements, on_error=None):
+        """
+        Возвращает список сработавших правил (словари id, name, action, priority).
+        on_error(rule, exception) вызывается для правил, которые нельзя вычислить
+        (например, нет нужного измерения).
+        """
+        activated = []
+        for rule in self.rules:
+            try:
+                if rule.test(measurements):
+                    activated.append(rule.as_dict())
+            except (KeyError, TypeError) as e:
+                if on_error is not None:
+                    on_error(rule, e)
+        return activated
+
+    def evaluate_batch(self, columns, on_error=None):
+        """
+        Пакетный вывод для блока измерений: columns — словарь столбцов NumPy.
+        Возвращает массив номеров (в self.rules) правила-победителя для каждой строки:
+        первое сработавшее правило в порядке приоритета, -1 — ни одно не сработало.
+        """
+        n = len(next(iter(columns.values())))
+        winners = np.full(n, -1, dtype=np.int64)
+        undecided = np.ones(n, dtype=bool)
+        for index, rule in enumerate(self.rules):
+            try:
+                hit = undecided & rule.mask(columns)
+            except (KeyError, TypeError) as e:
+                if on_error is not None:
+                    on_error(rule, e)
+                continue
+            winners[hit] = index
+            undecided &= ~hit
+            if not undecided.any():
+                break
+        return winners
+
+
+# Отметка отсутствующего измерения
+_MISSING = object()
+
+
+def _cell(thresholds, value):
+    """
+    Положение значения относительно отсортированных порогов.
+    Внутри одной ячейки результат любого сравнения «значение op порог» не меняется.
+    NaN не сравним ни с одним порогом и получает отдельную ячейку (None, value):
+    такие ячейки никогда не равны друг другу, и правила пересчитываются.
+    """
+    if value != value:
+        return None, value
+    try:
+        return bisect_left(thresholds, value), bisect_right(thresholds, value)
+    except TypeError:
+        return None, value
+
+
+class IncrementalMatcher:
+    """
+    Инкрементальное сопоставление правил: между шагами пересчитываются
+    только правила, чьи входы изменились.
+
+    Правила вида «переменная op число» индексируются по порогам каждой переменной:
+    правило пересчитывается, только если значение пересекло один из его порогов.
+    Остальные правила (например, сравнение двух переменных) пересчитываются
+    при любом изменении своих переменных. Результат совпадает с RuleSet.evaluate().
+    """
+
+    def __init__(self, rule_set):
+        self.rule_set = rule_set
+        self.rules = rule_set.rules
+        self._dicts = [rule.as_dict() for rule in self.rules]
+        # переменная -> отсортированные пороги и номера правил для каждого порога
+        self._thresholds = {}
+        self._threshold_rules = {}
+        # переменная -> номера правил, пересчитываемых при любом изменении значения
+        self._value_rules = {}
+        # переменная -> все номера правил, зависящих от нее
+        self._variable_rules = {}
+        by_threshold = {}
+        for index, rule in enumerate(self.rules):
+            thresholds = condition_thresholds(rule.condition)
+            for name in rule.variables:
+                self._variable_rules.setdefault(name, set()).add(index)
+                if thresholds is None:
+                    self._value_rules.setdefault(name, set()).add(index)
+                else:
+                    for value in thresholds.get(name, ()):
+                        by_threshold.setdefault(name, {}).setdefault(value, set()).add(index)
+        for name, rules_at in by_threshold.items():
+            values = sorted(rules_at)
+            self._thresholds[name] = values
+            self._threshold_rules[name] = [rules_at[value] for value in values]
+        self.reset()
+
+    def reset(self):
+        """Забывает предыдущее состояние: следующий вызов пересчитает все правила"""
+        self._cells = None
+        self._values = None
+        self._active = set()
+        self._failed = {}
+        self._result = []
+        self.evaluated = 0
+
+    def _changed_rules(self, measurements):
+        """Номера правил, затронутых изменением измерений, и новые ячейки"""
+        cells = {}
+        values = {}
+        changed = set()
+        for name, rule_indices in self._variable_rules.items():
+            value = measurements.get(name, _MISSING)
+            old_value = self._values[name]
+            if (value is _MISSING) != (old_value is _MISSING):
+                # переменная появилась или пропала
+                changed |= rule_indices
+            thresholds = self._thresholds.get(name)
+            if thresholds is not None:
+                cell = None if value is _MISSING else _cell(thresholds, value)
+                cells[name] = cell
+                old_cell = self._cells[name]
+                if cell != old_cell and cell is not None and old_cell is not None:
+                    if cell[0] is None or old_cell[0] is None:
+                        changed |= rule_indices
+                    else:
+                        # пересеченные пороги
+                        rules_at = self._threshold_rules[name]
+                        for i in range(min(cell[0], old_cell[0]), max(cell[1], old_cell[1])):
+                            changed |= rules_at[i]
+            values[name] = value
+            if name in self._value_rules and value is not old_value and value != old_value:
+                changed |= self._value_rules[name]
+        return changed, cells, values
+
+    def _full_state(self, measurements):
+        values = {name: measurements.get(name, _MISSING) for name in self._variable_rules}
+        cells = {name: None if values[name] is _MISSING else _cell(thresholds, values[name])
+                 for name, thresholds in self._thresholds.items()}
+        return set(range(len(self.rules))), cells, values
+
+    def evaluate(self, measurements, on_error=None):
+        """
+        Список сработавших правил (как RuleSet.evaluate()) с пересчетом
+        только затронутых правил. Список строится заново, только если набор
+        сработавших правил изменился; иначе возвращается тот же список с теми же
+        словарями — вызывающий код копирует их, если собирается изменять.
+        """
+        if self._values is None:
+            changed, cells, values = self._full_state(measurements)
+        else:
+            changed, cells, values = self._changed_rules(measurements)
+        self._cells, self._values = cells, values
+
+        active_changed = False
+        for index in changed:
+            self.evaluated += 1
+            self._failed.pop(index, None)
+            try:
+                hit = self.rules[index].test(measurements)
+            except (KeyError, TypeError) as e:
+                self._failed[index] = e
+                hit = False
+            if hit != (index in self._active):
+                active_changed = True
+                if hit:
+                    self._active.add(index)
+                else:
+                    self._active.discard(index)
+
+        if on_error is not None:
+            for index in sorted(self._failed):
+                on_error(self.rules[index], self._failed[index])
+        if active_changed:
+            self._result = [self._dicts[index] for index in sorted(self._active)]
+        return self._result
+
+
+def check_incremental(rule_set, states):
+    """
+    Сверяет IncrementalMatcher с RuleSet.evaluate() на последовательности states.
+    Возвращает номера шагов, на которых списки сработавших правил различаются.
+    """
+    matcher = IncrementalMatcher(rule_set)
+    mismatches = []
+    for step, measurements in enumerate(states):
+        expected = [rule['id'] for rule in rule_set.evaluate(measurements)]
+        actual = [rule['id'] for rule in matcher.evaluate(measurements)]
+        if actual != expected:
+            mismatches.append(step)
+    return mismatches
+
+
+def random_check(rules=300, steps=5000, seed=0):
+    """
+    Случайные правила (сравнения с порогами, цепочки, сравнения переменных,
+    проверки истинности) и состояния, в которых часть значений — NaN или
+    точно равна порогам. Возвращает (число шагов, число расхождений).
+    """
+    import random
+    rng = random.Random(seed)
+    names = ['a', 'b', 'c', 'd']
+    thresholds = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+    def atom():
+        kind = rng.random()
+        name = rng.choice(names)
+        if kind < 0.5:
+            return f"{name} {rng.choice(['<', '<=', '>', '>=', '==', '!='])} {rng.choice(thresholds)}"
+        if kind < 0.7:
+            low, high = sorted(rng.sample(thresholds, 2))
+            return f"{low} < {name} <= {high}"
+        if kind < 0.85:
+            return f"{name} > {rng.choice(names)}"
+        return name if rng.random() < 0.5 else f"not {name}"
+
+    rows = []
+    for i in range(rules):
+        condition = atom()
+        for _ in range(rng.randrange(3)):
+            condition = f"{condition} {rng.choice(['and', 'or'])} {atom()}"
+        rows.append((i, f"rule {i}", condition, 'action', rng.randrange(5)))
+    rule_set = RuleSet(rows)
+
+    state = {name: 0.5 for name in names}
+    states = []
+    for _ in range(steps):
+        name = rng.choice(names)
+        kind = rng.random()
+        if kind < 0.1:
+            state[name] = float('nan')
+        elif kind < 0.4:
+            state[name] = rng.choice(thresholds)
+        else:
+            state[name] = rng.uniform(-0.25, 1.25)
+        states.append(dict(state))
+    return steps, len(check_incremental(rule_set, states))
+
+
+if __name__ == "__main__":
+    for seed in range(5):
+        steps, mismatches = random_check(seed=seed)
+        print(f"seed={seed}: шагов {steps}, расхождений с RuleSet.evaluate(): {mismatches}")
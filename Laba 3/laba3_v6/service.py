@@ -0,0 +1,271 @@
+import argparse
+import asyncio
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from actions import ACTIONS, ACTION_CLAMPED, NO_ACTION
+from monte_carlo import BOUNDS, ENVIRONMENT_DRIFT, INITIAL_STATE
+from rules import IncrementalMatcher
+from storage import BufferedWriter, measurement_row, action_row
+from water_system import WaterTreatmentSystem, InferenceEngine, WaterTreatmentSimulator
+
+# Режим службы: измерения нескольких установок поступают асинхронно,
+# решение принимается сразу по каждому измерению, а запись в базу
+# выполняет отдельный поток, так что задержки диска не задерживают решения.
+
+class SimulatedPlant:
+    """Установка-имитатор: состояние меняется как в WaterTreatmentSimulator"""
+
+    def __init__(self, seed):
+        self.state = dict(INITIAL_STATE)
+        self.random = random.Random(seed)
+
+    def drift(self):
+        for name, (low, high) in ENVIRONMENT_DRIFT.items():
+            self.state[name] += self.random.uniform(low, high)
+            self.state[name] = max(BOUNDS[name][0], min(BOUNDS[name][1], self.state[name]))
+
+    def apply(self, action):
+        if action in ACTIONS:
+            self.state[ACTIONS[action].variable] += ACTIONS[action].delta
+        for name in ACTION_CLAMPED:
+            self.state[name] = max(BOUNDS[name][0], min(BOUNDS[name][1], self.state[name]))
+
+
+class PersistenceThread(threading.Thread):
+    """
+    Фоновая запись измерений и действий. Готовые строки передаются через
+    ограниченную очередь; поток пишет их пакетами по batch_size строк
+    или раз в flush_interval секунд.
+    flush_delay — искусственная задержка каждой записи (имитация медленного диска).
+    Если запись завершилась ошибкой, поток останавливается и сохраняет ее в error;
+    submit() и stop() после этого передают ее вызывающему коду.
+    """
+
+    def __init__(self, database, max_pending=10000, batch_size=500, flush_interval=0.5, flush_delay=0.0):
+        super().__init__(name='persistence', daemon=True)
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.writer = BufferedWriter(database, batch_size, flush_interval)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_delay = flush_delay
+        self.stopped = threading.Event()
+        self.error = None
+        self._measurements = []
+        self._actions = []
+
+    def _check(self):
+        if self.error is not None or not self.is_alive() and not self.stopped.is_set():
+            raise RuntimeError("Поток записи остановлен из-за ошибки") from self.error
+
+    def submit(self, kind, row):
+        """Передает строку без ожидания; False — очередь заполнена"""
+        self._check()
+        try:
+            self.queue.put_nowait((kind, row))
+            return True
+        except queue.Full:
+            return False
+
+    def _flush(self):
+        if self._measurements or self._actions:
+            if self.flush_delay:
+                time.sleep(self.flush_delay)
+            self.writer.write_rows(self._measurements, self._actions)
+            self._measurements, self._actions = [], []
+
+    def run(self):
+        try:
+            last_flush = time.monotonic()
+            while not (self.stopped.is_set() and self.queue.empty()):
+                try:
+                    kind, row = self.queue.get(timeout=self.flush_interval)
+                    (self._measurements if kind == 'measurement' else self._actions).append(row)
+                except queue.Empty:
+                    pass
+                pending = len(self._measurements) + len(self._actions)
+                if pending >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                    self._flush()
+                    last_flush = time.monotonic()
+            self._flush()
+            self.writer.close()
+        except Exception as e:
+            self.error = e
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        if self.error is not None:
+            raise RuntimeError("Поток записи остановлен из-за ошибки") from self.error
+
+
+class DecisionService:
+    """
+    Асинхронная служба принятия решений.
+    Производители (по одному на установку) кладут измерения в общую ограниченную
+    очередь; цикл решений для каждого измерения выбирает правило (инкрементально,
+    отдельный сопоставитель на установку), считает нечеткие параметры воздействия,
+    применяет действие к установке и передает строки потоку записи.
+    Если поток записи не успевает (его очередь заполнена выше high_water),
+    производители приостанавливают съем измерений (обратное давление), поэтому
+    принятые измерения по-прежнему обрабатываются без ожидания диска.
+    p50/p99 задержки считаются по последним latency_window решениям,
+    поэтому память и время отчета не растут со временем работы.
+    """
+
+    def __init__(self, db_path='water_treatment.db', plants=4, rate=100.0, budget_ms=5.0,
+                 max_queue=1000, max_pending=10000, flush_delay=0.0, report_interval=1.0, seed=0,
+                 latency_window=10000):
+        self.system = WaterTreatmentSystem(db_path)
+        self.engine = InferenceEngine(db_path, self.system.database)
+        self.persistence = PersistenceThread(self.system.database, max_pending, flush_delay=flush_delay)
+        self.plants = [SimulatedPlant(f'{seed}:{i}') for i in range(plants)]
+        self.interval = 1.0 / rate
+        self.budget = budget_ms / 1000.0
+        self.max_queue = max_queue
+        self.report_interval = report_interval
+        self.high_water = max(1, max_pending - 2 * max_queue)
+        self.latencies = deque(maxlen=latency_window)
+        self.stats = {'decisions': 0, 'budget_misses': 0, 'backpressure_waits': 0,
+                      'max_queue_depth': 0, 'max_writer_depth': 0}
+        self._matchers = None
+        self._rule_set = None
+        self._inbox = None
+
+    def _matcher(self, plant, rule_set):
+        if rule_set is not self._rule_set:
+            # таблица правил изменилась — новые сопоставители
+            self._rule_set = rule_set
+            self._matchers = [IncrementalMatcher(rule_set) for _ in self.plants]
+        return self._matchers[plant]
+
+    async def produce(self, plant, inbox, deadline):
+        """Датчик установки: измерение каждые interval секунд"""
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        while loop.time() < deadline:
+            if self.persistence.queue.qsize() >= self.high_water:
+                # поток записи отстает — не снимаем новых измерений
+                self.stats['backpressure_waits'] += 1
+                await asyncio.sleep(self.interval)
+                next_time = loop.time()
+                continue
+            self.plants[plant].drift()
+            await inbox.put((plant, time.perf_counter(), self.plants[plant].state.copy()))
+            next_time += self.interval
+            await asyncio.sleep(max(0.0, next_time - loop.time()))
+
+    def decide(self, plant, measurements):
+        """Решение по одному измерению: (действие или None, выходы нечеткого вывода)"""
+        rule_set, fuzzy_system = self.engine.resolve()  # одна проверка версии каталога
+        activated = self._matcher(plant, rule_set).evaluate(measurements)
+        outputs = fuzzy_system.infer_one(measurements)
+        return (activated[0]['action'] if activated else None), outputs
+
+    async def consume(self, inbox):
+        while True:
+            plant, produced, measurements = await inbox.get()
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], inbox.qsize() + 1)
+
+            action, outputs = self.decide(plant, measurements)
+            self.plants[plant].apply(action)
+            latency = time.perf_counter() - produced
+            self.latencies.append(latency)
+            self.stats['decisions'] += 1
+            if latency > self.budget:
+                self.stats['budget_misses'] += 1
+
+            rows = [('measurement', measurement_row(measurements))]
+            if action in ACTIONS:
+                spec = ACTIONS[action]
+                intensity, duration = WaterTreatmentSimulator.action_parameters(
+                    outputs, spec.intensity, spec.duration, spec.ph_correction)
+                rows.append(('action', action_row(spec.record, intensity, duration)))
+            elif action is None:
+                rows.append(('action', action_row(NO_ACTION, 0.0, 0)))
+            for kind, row in rows:
+                while not self.persistence.submit(kind, row):
+                    # очередь записи переполнена несмотря на паузу производителей
+                    await asyncio.sleep(0.001)
+            self.stats['max_writer_depth'] = max(self.stats['max_writer_depth'],
+                                                 self.persistence.queue.qsize())
+            inbox.task_done()
+
+    def summary(self):
+        latencies = np.fromiter(self.latencies, dtype=float, count=len(self.latencies)) * 1000.0
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (0.0, 0.0)
+        return dict(self.stats, p50_ms=p50, p99_ms=p99,
+                    queue_depth=self._inbox.qsize() if self._inbox else 0,
+                    writer_depth=self.persistence.queue.qsize(),
+                    rows_written=self.persistence.writer.rows_written)
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            s = self.summary()
+            print(f"решений: {s['decisions']}, p50={s['p50_ms']:.2f} мс, p99={s['p99_ms']:.2f} мс, "
+                  f"очередь: {s['queue_depth']}, очередь записи: {s['writer_depth']}, "
+                  f"ожиданий записи: {s['backpressure_waits']}")
+
+    async def run(self, duration):
+        """Работает duration секунд, затем дожидается обработки очереди и записи"""
+        self._inbox = asyncio.Queue(maxsize=self.max_queue)
+        self.persistence.start()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration
+        consumer = asyncio.create_task(self.consume(self._inbox))
+        reporter = asyncio.create_task(self.report())
+
+        async def drain():
+            await asyncio.gather(*(self.produce(i, self._inbox, deadline) for i in range(len(self.plants))))
+            await self._inbox.join()
+
+        # если цикл решений упал (например, остановился поток записи),
+        # очередь больше не разбирается — ждать ее опустошения нельзя
+        draining = asyncio.create_task(drain())
+        await asyncio.wait({draining, consumer}, return_when=asyncio.FIRST_COMPLETED)
+        consumer.cancel()
+        reporter.cancel()
+        try:
+            if consumer.done() and not consumer.cancelled() and consumer.exception() is not None:
+                draining.cancel()
+                raise consumer.exception()
+            await draining
+        finally:
+            # остановка потока записи не должна блокировать цикл событий
+            await loop.run_in_executor(None, self.persistence.stop)
+        return self.summary()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Служба принятия решений для нескольких установок")
+    parser.add_argument("--db", default="water_treatment.db")
+    parser.add_argument("--plants", type=int, default=4, help="число установок (потоков измерений)")
+    parser.add_argument("--rate", type=float, default=100.0, help="измерений в секунду на установку")
+    parser.add_argument("--duration", type=float, default=5.0, help="длительность работы, с")
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="допустимая задержка решения, мс")
+    parser.add_argument("--max-queue", type=int, default=1000, help="размер входной очереди")
+    parser.add_argument("--max-pending", type=int, default=10000, help="размер очереди записи")
+    parser.add_argument("--flush-delay", type=float, default=0.0,
+                        help="искусственная задержка каждой записи, с (имитация медленного диска)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    service = DecisionService(args.db, args.plants, args.rate, args.budget_ms, args.max_queue,
+                              args.max_pending, args.flush_delay, seed=args.seed)
+    result = asyncio.run(service.run(args.duration))
+    print("\n=== ИТОГ ===")
+    print(f"Решений: {result['decisions']}, превышений {args.budget_ms} мс: {result['budget_misses']}")
+    print(f"Задержка решения: p50={result['p50_ms']:.3f} мс, p99={result['p99_ms']:.3f} мс")
+    print(f"Наибольшая глубина очереди: {result['max_queue_depth']}, "
+          f"очереди записи: {result['max_writer_depth']}, ожиданий записи: {result['backpressure_waits']}")
+    print(f"Записано строк: {result['rows_written']}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
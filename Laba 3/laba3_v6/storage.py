@@ -0,0 +1,380 @@
+import atexit
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+
+import numpy as np
+import metrics
+
+# Измеряемые величины (столбцы таблицы measurements)
+MEASUREMENT_COLUMNS = ('pollution_level', 'water_flow', 'ph_level', 'temperature', 'oxygen_level')
+
+# Запросы вставки; одинаковый текст позволяет sqlite3 повторно использовать
+# подготовленные выражения из своего кэша
+MEASUREMENT_INSERT = (f'INSERT INTO measurements (timestamp, {", ".join(MEASUREMENT_COLUMNS)}) '
+                      f'VALUES (?, {", ".join("?" * len(MEASUREMENT_COLUMNS))})')
+ACTION_INSERT = 'INSERT INTO actions (timestamp, action_type, intensity, duration) VALUES (?, ?, ?, ?)'
+
+# Индекс для запросов по интервалам времени
+MEASUREMENT_INDEX = 'CREATE INDEX IF NOT EXISTS idx_measurements_timestamp ON measurements (timestamp)'
+
+
+def sqlite_timestamp():
+    """Текущее время UTC в формате CURRENT_TIMESTAMP (фиксируется в момент измерения, а не записи)"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def measurement_row(measurements):
+    """Строка для MEASUREMENT_INSERT с текущим временем"""
+    return (sqlite_timestamp(),) + tuple(measurements[name] for name in MEASUREMENT_COLUMNS)
+
+
+def action_row(action_type, intensity, duration):
+    """Строка для ACTION_INSERT с текущим временем"""
+    return sqlite_timestamp(), action_type, intensity, duration
+
+
+class Database:
+    """
+    Долгоживущие соединения с SQLite: по одному на поток (небольшой пул),
+    режим WAL, чтобы чтение не блокировалось записью.
+    setup(conn) — подготовка базы (например, создание схемы), выполняется
+    один раз при первом обращении к базе, а не при создании объекта.
+    """
+
+    def __init__(self, db_path, wal=True, setup=None):
+        self.db_path = db_path
+        self.wal = wal
+        self.setup = setup
+        self._ready = setup is None
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Соединение текущего потока (создается при первом обращении)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with metrics.timer('db_connect'):
+                conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+                if self.wal:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self.setup(conn)
+                    self._ready = True
+        return conn
+
+    def checkpoint(self):
+        """Переносит журнал WAL в основной файл базы с синхронизацией на диск"""
+        if self.wal:
+            self.connection().execute('PRAGMA wal_checkpoint(FULL)')
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class BufferedWriter:
+    """
+    Буфер записи измерений и действий: строки копятся в памяти и записываются
+    одной транзакцией через executemany, когда набирается batch_size строк
+    или самая старая строка ждет дольше flush_interval секунд.
+    Срок проверяется при добавлении строк: сам по себе простаивающий буфер
+    не сбрасывается — для этого есть flush_if_due() (например, из цикла
+    программы) и close(). Незакрытые буферы сбрасываются при завершении программы.
+    Если запись не удалась, строки возвращаются в буфер, а исключение передается дальше.
+    """
+
+    def __init__(self, database, batch_size=500, flush_interval=1.0):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._measurements = []
+        self._actions = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.rows_written = 0
+        _open_writers.add(self)
+
+    def __len__(self):
+        return len(self._measurements) + len(self._actions)
+
+    def _add(self, buffer, row):
+        with self._lock:
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            buffer.append(row)
+
+    def add_measurement(self, measurements):
+        self._add(self._measurements, measurement_row(measurements))
+        self.flush_if_due()
+
+    def add_action(self, action_type, intensity, duration):
+        self._add(self._actions, action_row(action_type, intensity, duration))
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        """Сбрасывает буфер, если набралось batch_size строк или истек flush_interval"""
+        with self._lock:
+            due = len(self._measurements) + len(self._actions) >= self.batch_size or (
+                self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные строки одной транзакцией"""
+        with self._flush_lock:
+            with self._lock:
+                measurements, self._measurements = self._measurements, []
+                actions, self._actions = self._actions, []
+                oldest, self._oldest = self._oldest, None
+            try:
+                self.write_rows(measurements, actions)
+            except Exception:
+                # транзакция откатилась — строки возвращаются в начало буфера
+                with self._lock:
+                    self._measurements[:0] = measurements
+                    self._actions[:0] = actions
+                    if oldest is not None:
+                        self._oldest = oldest if self._oldest is None else min(oldest, self._oldest)
+                raise
+
+    def write_rows(self, measurements, actions):
+        """Записывает готовые строки измерений и действий одной транзакцией"""
+        if not measurements and not actions:
+            return
+        conn = self.database.connection()
+        with metrics.timer('db_commit'), conn:
+            if measurements:
+                conn.executemany(MEASUREMENT_INSERT, measurements)
+            if actions:
+                conn.executemany(ACTION_INSERT, actions)
+        self.rows_written += len(measurements) + len(actions)
+
+    def close(self):
+        """Надежное завершение: сброс буфера и контрольная точка WAL"""
+        self.flush()
+        self.database.checkpoint()
+        _open_writers.discard(self)
+
+
+# Незакрытые буферы (слабые ссылки, чтобы не удерживать объекты до выхода)
+_open_writers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_writers():
+    # ошибка одного буфера не должна помешать сбросить остальные
+    for writer in list(_open_writers):
+        try:
+            writer.close()
+        except Exception as e:
+            print(f"Не удалось сбросить буфер записи в {writer.database.db_path}: {e}")
+
+
+def lttb(x, y, threshold):
+    """
+    Прореживание ряда методом Largest-Triangle-Three-Buckets:
+    возвращает индексы threshold точек, сохраняющих форму графика.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # среднее следующей корзины (для последней — последняя точка)
+        next_end = min(int((i + 2) * every) + 1, n - 1)
+        if end < next_end:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+class MeasurementStore:
+    """
+    Запросы к таблице measurements по интервалам времени: потоковое чтение
+    столбцами NumPy, агрегаты по корзинам времени на стороне SQLite
+    и прореживание до заданного числа точек для графиков.
+    Границы start/end — строки формата 'YYYY-MM-DD HH:MM:SS' (включительно).
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    @staticmethod
+    def _check_columns(columns):
+        """Имена столбцов подставляются в текст запроса, поэтому допускаются только MEASUREMENT_COLUMNS"""
+        for column in columns:
+            if column not in MEASUREMENT_COLUMNS:
+                raise ValueError(f"Неизвестный столбец измерений: {column!r}")
+
+    @staticmethod
+    def _where(start, end):
+        conditions, params = [], []
+        if start is not None:
+            conditions.append('timestamp >= ?')
+            params.append(start)
+        if end is not None:
+            conditions.append('timestamp <= ?')
+            params.append(end)
+        return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+    def count(self, start=None, end=None):
+        where, params = self._where(start, end)
+        return self.database.connection().execute(
+            f'SELECT COUNT(*) FROM measurements {where}', params).fetchone()[0]
+
+    def id_range(self, start=None, end=None):
+        """Первый и последний id измерений интервала ((None, None) — интервал пуст)"""
+        where, params = self._where(start, end)
+        return tuple(self.database.connection().execute(
+            f'SELECT MIN(id), MAX(id) FROM measurements {where}', params).fetchone())
+
+    def iter_range(self, start=None, end=None, columns=MEASUREMENT_COLUMNS, chunk_size=65536):
+        """
+        Потоково читает измерения интервала через курсор частями по chunk_size строк.
+        Выдает словари: 'id', 'timestamp' (datetime64[s]) и запрошенные столбцы.
+        """
+        self._check_columns(columns)
+        where, params = self._where(start, end)
+        cursor = self.database.connection().execute(
+            f'SELECT id, timestamp, {", ".join(columns)} FROM measurements {where} '
+            'ORDER BY timestamp, id', params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            block = {
+                'id': np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+                'timestamp': np.array([row[1] for row in rows], dtype='datetime64[s]')
+            }
+            values = np.array([row[2:] for row in rows], dtype=float)
+            for i, name in enumerate(columns):
+                block[name] = values[:, i]
+            yield block
+
+    def read_range(self, start=None, end=None, columns=MEASUREMENT_COLUMNS):
+        """Весь интервал одним набором столбцов (для небольших интервалов)"""
+        blocks = list(self.iter_range(start, end, columns))
+        if not blocks:
+            return {'id': np.empty(0, np.int64), 'timestamp': np.empty(0, 'datetime64[s]'),
+                    **{name: np.empty(0) for name in columns}}
+        return {key: np.concatenate([b[key] for b in blocks]) for key in blocks[0]}
+
+    def aggregate(self, bucket_seconds, start=None, end=None, columns=MEASUREMENT_COLUMNS):
+        """
+        Агрегаты по корзинам времени шириной bucket_seconds, вычисляемые в SQLite:
+        начало корзины, число строк и min/max/mean каждого столбца.
+        """
+        self._check_columns(columns)
+        where, params = self._where(start, end)
+        aggregates = ', '.join(f'MIN({c}), MAX({c}), AVG({c})' for c in columns)
+        rows = self.database.connection().execute(
+            f"SELECT CAST(strftime('%s', timestamp) AS INTEGER) / ? AS bucket, COUNT(*), {aggregates} "
+            f'FROM measurements {where} GROUP BY bucket ORDER BY bucket',
+            [bucket_seconds] + params).fetchall()
+        data = np.array(rows, dtype=float).reshape(-1, 2 + 3 * len(columns))
+        result = {
+            'bucket': (data[:, 0].astype(np.int64) * bucket_seconds).astype('datetime64[s]'),
+            'count': data[:, 1].astype(np.int64)
+        }
+        for i, name in enumerate(columns):
+            result[f'{name}_min'] = data[:, 2 + 3 * i]
+            result[f'{name}_max'] = data[:, 3 + 3 * i]
+            result[f'{name}_mean'] = data[:, 4 + 3 * i]
+        return result
+
+    def downsample(self, column, target_points, start=None, end=None):
+        """
+        Не более target_points точек столбца для графика.
+        SQLite сначала оставляет минимум и максимум в каждой из 2*target_points корзин
+        (по номеру строки) и первую и последнюю строки интервала, затем кандидаты
+        прореживаются методом LTTB (крайние точки он сохраняет).
+        Возвращает (id, timestamp, значения).
+        """
+        self._check_columns((column,))
+        where, params = self._where(start, end)
+        conn = self.database.connection()
+        total, first_id, last_id = conn.execute(
+            f'SELECT COUNT(*), MIN(id), MAX(id) FROM measurements {where}', params).fetchone()
+        if total <= target_points:
+            data = self.read_range(start, end, (column,))
+            return data['id'], data['timestamp'], data[column]
+
+        buckets = 2 * target_points
+        bucket = f'(id - {first_id}) * {buckets} / {last_id - first_id + 1}'
+        rows = conn.execute(
+            f'SELECT id, timestamp, value FROM ('
+            f'SELECT id, timestamp, MIN({column}) AS value FROM measurements {where} GROUP BY {bucket} '
+            f'UNION SELECT id, timestamp, MAX({column}) AS value FROM measurements {where} GROUP BY {bucket} '
+            f'UNION SELECT id, timestamp, {column} AS value FROM measurements WHERE id IN (?, ?)'
+            f') ORDER BY id', params + params + [first_id, last_id]).fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        timestamps = np.array([row[1] for row in rows], dtype='datetime64[s]')
+        values = np.array([row[2] for row in rows], dtype=float)
+        keep = lttb(ids.astype(float), values, target_points)
+        return ids[keep], timestamps[keep], values[keep]
+
+
+def benchmark_writes(rows=5000, batch_size=500):
+    """
+    Сравнивает запись измерений «соединение и commit на каждую строку»
+    с буферизованной записью. Возвращает строк в секунду для обоих способов.
+    """
+    state = {name: 0.5 for name in MEASUREMENT_COLUMNS}
+    schema = ('CREATE TABLE measurements (id INTEGER PRIMARY KEY, '
+              'timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, '
+              + ', '.join(f'{name} REAL' for name in MEASUREMENT_COLUMNS) + ')')
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Прежний способ: новое соединение, одна строка и commit
+        path = os.path.join(tmp, 'per_row.db')
+        sqlite3.connect(path).execute(schema).connection.close()
+        start = time.perf_counter()
+        for _ in range(rows):
+            conn = sqlite3.connect(path)
+            conn.execute(MEASUREMENT_INSERT, (sqlite_timestamp(),) + tuple(state.values()))
+            conn.commit()
+            conn.close()
+        results['per_row'] = rows / (time.perf_counter() - start)
+
+        # Буферизованная запись через одно соединение в режиме WAL
+        path = os.path.join(tmp, 'buffered.db')
+        sqlite3.connect(path).execute(schema).connection.close()
+        database = Database(path)
+        writer = BufferedWriter(database, batch_size=batch_size, flush_interval=float('inf'))
+        start = time.perf_counter()
+        for _ in range(rows):
+            writer.add_measurement(state)
+        writer.close()
+        results['buffered'] = rows / (time.perf_counter() - start)
+        database.close()
+    return results
+
+
+if __name__ == "__main__":
+    for method, rate in benchmark_writes().items():
+        print(f"{method}: {rate:.0f} строк/с")
@@ -0,0 +1,189 @@
+from collections import deque
+
+import numpy as np
+from storage import MEASUREMENT_COLUMNS
+
+# Потоковая обработка измерений: скользящие окна на кольцевых буферах NumPy
+# и производные признаки (среднее, ст. отклонение, минимум, максимум, тренд),
+# которые можно использовать в условиях правил, например
+# 'pollution_level_trend_5 > 0.02 and pollution_level > 0.5'.
+# Decimator прореживает запись сырых измерений в базу.
+
+FEATURE_STATS = ('mean', 'std', 'min', 'max', 'trend')
+
+
+class RollingWindow:
+    """
+    Скользящее окно из size последних значений для нескольких величин сразу.
+    Значения хранятся в кольцевом буфере (size x число величин).
+    Среднее и дисперсия обновляются за O(1) (формулы Уэлфорда для скользящего окна),
+    минимум и максимум — монотонными очередями (амортизированно O(1)).
+    """
+
+    def __init__(self, size, count):
+        if size < 2:
+            raise ValueError("Окно должно содержать не меньше двух значений")
+        self.size = size
+        self.buffer = np.zeros((size, count))
+        self.position = 0
+        self.filled = 0
+        self.step = 0
+        self.mean = np.zeros(count)
+        self._m2 = np.zeros(count)
+        self._minima = [deque() for _ in range(count)]
+        self._maxima = [deque() for _ in range(count)]
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if self.filled < self.size:
+            self.filled += 1
+            delta = values - self.mean
+            self.mean += delta / self.filled
+            self._m2 += delta * (values - self.mean)
+        else:
+            # значение, выходящее из окна, заменяется новым
+            old = self.buffer[self.position]
+            old_mean = self.mean.copy()
+            self.mean += (values - old) / self.size
+            self._m2 += (values - old) * (values - self.mean + old - old_mean)
+        self.buffer[self.position] = values
+        self.position = (self.position + 1) % self.size
+
+        expired = self.step - self.size
+        for i, value in enumerate(values.tolist()):
+            minima, maxima = self._minima[i], self._maxima[i]
+            while minima and minima[-1][1] >= value:
+                minima.pop()
+            minima.append((self.step, value))
+            if minima[0][0] <= expired:
+                minima.popleft()
+            while maxima and maxima[-1][1] <= value:
+                maxima.pop()
+            maxima.append((self.step, value))
+            if maxima[0][0] <= expired:
+                maxima.popleft()
+        self.step += 1
+
+    @property
+    def variance(self):
+        return np.maximum(self._m2 / max(self.filled, 1), 0.0)
+
+    @property
+    def minimum(self):
+        return np.array([q[0][1] for q in self._minima])
+
+    @property
+    def maximum(self):
+        return np.array([q[0][1] for q in self._maxima])
+
+    @property
+    def trend(self):
+        """Средняя скорость изменения за шаг: (последнее - самое старое) / (длина окна - 1)"""
+        if self.filled < 2:
+            return np.zeros_like(self.mean)
+        newest = self.buffer[self.position - 1]
+        oldest = self.buffer[self.position] if self.filled == self.size else self.buffer[0]
+        return (newest - oldest) / (self.filled - 1)
+
+
+class StreamingFeatures:
+    """
+    Скользящие признаки измерений по нескольким окнам.
+    update() принимает словарь измерений и возвращает словарь признаков
+    с именами вида '<величина>_<mean|std|min|max|trend>_<окно>'.
+    """
+
+    def __init__(self, windows=(5, 20), variables=MEASUREMENT_COLUMNS):
+        self.variables = tuple(variables)
+        self.windows = {size: RollingWindow(size, len(self.variables)) for size in windows}
+        self.names = {size: {stat: [f'{name}_{stat}_{size}' for name in self.variables] for stat in FEATURE_STATS}
+                      for size in windows}
+
+    def update(self, measurements):
+        values = [measurements[name] for name in self.variables]
+        features = {}
+        for size, window in self.windows.items():
+            window.update(values)
+            stats = {
+                'mean': window.mean,
+                'std': np.sqrt(window.variance),
+                'min': window.minimum,
+                'max': window.maximum,
+                'trend': window.trend,
+            }
+            for stat, column in stats.items():
+                features.update(zip(self.names[size][stat], column.tolist()))
+        return features
+
+
+class Decimator:
+    """
+    Правило прореживания записи измерений.
+    every — записывать каждое every-е измерение;
+    deadband — {величина: порог}: записывать, только если какая-либо величина
+    изменилась больше порога с момента последней записи
+    (но не реже одного раза в max_gap измерений, если max_gap задан).
+    """
+
+    def __init__(self, every=1, deadband=None, max_gap=None):
+        self.every = every
+        self.deadband = deadband
+        self.max_gap = max_gap
+        self.seen = 0
+        self.accepted = 0
+        self._last = None
+        self._since = 0
+
+    def accept(self, measurements):
+        """True, если измерение нужно записать"""
+        self.seen += 1
+        self._since += 1
+        if self.deadband is not None:
+            write = self._last is None \
+                or any(abs(measurements[name] - self._last[name]) > threshold
+                       for name, threshold in self.deadband.items()) \
+                or (self.max_gap is not None and self._since >= self.max_gap)
+        else:
+            write = (self.seen - 1) % self.every == 0
+        if write:
+            self.accepted += 1
+            self._since = 0
+            self._last = {name: measurements[name] for name in (self.deadband or ())}
+        return write
+
+    @property
+    def ratio(self):
+        """Доля записанных измерений"""
+        return self.accepted / self.seen if self.seen else 1.0
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    # Поток из 100 000 измерений со слабым дрейфом: время обновления признаков
+    # и доля измерений, которые попали бы в базу при разных правилах прореживания
+    rng = random.Random(0)
+    state = {'pollution_level': 0.5, 'water_flow': 100.0, 'ph_level': 7.0,
+             'temperature': 20.0, 'oxygen_level': 5.0}
+    features = StreamingFeatures()
+    policies = {
+        'каждое 100-е': Decimator(every=100),
+        'зона нечувствительности': Decimator(deadband={'pollution_level': 0.05, 'ph_level': 0.1,
+                                                       'temperature': 1.0, 'oxygen_level': 0.5},
+                                             max_gap=1000),
+    }
+    steps = 100000
+    elapsed = 0.0
+    for _ in range(steps):
+        for name, spread in (('pollution_level', 0.002), ('ph_level', 0.005),
+                             ('temperature', 0.02), ('oxygen_level', 0.01)):
+            state[name] += rng.uniform(-spread, spread)
+        start = time.perf_counter()
+        features.update(state)
+        elapsed += time.perf_counter() - start
+        for decimator in policies.values():
+            decimator.accept(state)
+    print(f"Обновление признаков: {elapsed / steps * 1e6:.1f} мкс на измерение")
+    for name, decimator in policies.items():
+        print(f"{name}: записано {decimator.accepted} из {decimator.seen} ({decimator.ratio:.2%})")
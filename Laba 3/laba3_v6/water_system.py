@@ -1,18 +1,36 @@
-import sqlite3
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime
+import os
 import random
+import sqlite3
+import metrics
+from actions import ACTIONS, NO_ACTION
+from catalog import CatalogCache, install_catalog_version
+from fuzzy_inference import FuzzyInferenceSystem, get_mf
+from rules import IncrementalMatcher
+from storage import Database, BufferedWriter, MeasurementStore, MEASUREMENT_COLUMNS, MEASUREMENT_INDEX
+from streaming import StreamingFeatures
+
+
+# Версия схемы базы (PRAGMA user_version): при совпадении настройка схемы пропускается
+SCHEMA_VERSION = 1
 
 
 class WaterTreatmentSystem:
+    """
+    База онтологии, правил, измерений и действий. Файл базы открывается
+    и схема создается при первом обращении к database, а не в конструкторе.
+    """
+
     def __init__(self, db_path='water_treatment.db'):
         self.db_path = db_path
-        self.init_database()
+        self.database = Database(db_path, setup=self.init_database)
 
-    def init_database(self):
-        """Инициализация базы данных"""
-        conn = sqlite3.connect(self.db_path)
+    def init_database(self, conn=None):
+        """Инициализация базы данных (только если схема еще не в актуальной версии)"""
+        conn = conn or self.database.connection()
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            return
         cursor = conn.cursor()
 
         # Создание таблицы онтологии
@@ -50,6 +68,9 @@ class WaterTreatmentSystem:
             )
         ''')
 
+        # Индекс по времени для выборок интервалов
+        cursor.execute(MEASUREMENT_INDEX)
+
         # Создание таблицы действий
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS actions (
@@ -61,6 +82,20 @@ class WaterTreatmentSystem:
             )
         ''')
 
+        # Уникальные индексы запрещают повторы при заполнении. Если в базе уже есть
+        # дубликаты (повторное заполнение прежними версиями), строки пользователя
+        # не удаляются: индекс не создается, а заполнение ниже пропускает
+        # существующие строки проверкой NOT EXISTS
+        for index, table, columns in (('idx_ontology_concept', 'ontology', 'concept, property'),
+                                      ('idx_rules_name', 'rules', 'name')):
+            try:
+                cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} ({columns})')
+            except sqlite3.IntegrityError:
+                print(f"В таблице {table} есть повторяющиеся строки ({columns}); уникальный индекс не создан")
+
+        # Счетчик изменений онтологии и правил для кэша каталога
+        install_catalog_version(conn)
+
         # Добавляем данные в онтологию
         ontology_data = [
             ('pollution_level', 'low', 0.0, 'Низкий уровень загрязнения'),
@@ -80,7 +115,8 @@ class WaterTreatmentSystem:
 
         cursor.executemany('''
             INSERT OR IGNORE INTO ontology (concept, property, value, description)
-            VALUES (?, ?, ?, ?)
+            SELECT ?1, ?2, ?3, ?4
+            WHERE NOT EXISTS (SELECT 1 FROM ontology WHERE concept = ?1 AND property = ?2)
         ''', ontology_data)
 
         # Добавляем правила
@@ -98,71 +134,115 @@ class WaterTreatmentSystem:
 
         cursor.executemany('''
             INSERT OR IGNORE INTO rules (name, condition, action, priority)
-            VALUES (?, ?, ?, ?)
+            SELECT ?1, ?2, ?3, ?4
+            WHERE NOT EXISTS (SELECT 1 FROM rules WHERE name = ?1)
         ''', rules_data)
 
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
         conn.commit()
-        conn.close()
         print("База данных создана и заполнена!")
 
 
 class FuzzyLogic:
     """Класс для нечеткой логики"""
 
+    # Термы загрязнения: параметры треугольных функций (a, b, c)
+    POLLUTION_SETS = {
+        'low': (0, 0, 0.3),
+        'medium': (0.1, 0.4, 0.7),
+        'high': (0.5, 0.8, 1.0)
+    }
+
     @staticmethod
     def triangular_mf(x, a, b, c):
-        if x <= a:
-            return 0.0
-        elif a < x <= b:
-            return (x - a) / (b - a)
-        elif b < x <= c:
-            return (c - x) / (c - b)
-        else:
-            return 0.0
+        return get_mf('triangular', a, b, c).scalar(x)
+
+    @staticmethod
+    def triangular_mf_array(x, a, b, c):
+        """Векторный вариант triangular_mf() с теми же значениями"""
+        return get_mf('triangular', a, b, c)(x)
 
     def fuzzify_pollution(self, level):
-        return {
-            'low': self.triangular_mf(level, 0, 0, 0.3),
-            'medium': self.triangular_mf(level, 0.1, 0.4, 0.7),
-            'high': self.triangular_mf(level, 0.5, 0.8, 1.0)
-        }
+        return {term: get_mf('triangular', *params).scalar(level) for term, params in self.POLLUTION_SETS.items()}
+
+    def fuzzify_pollution_batch(self, levels):
+        """Фаззификация массива уровней загрязнения: термин -> массив степеней"""
+        return {term: get_mf('triangular', *params)(levels) for term, params in self.POLLUTION_SETS.items()}
 
 
 class InferenceEngine:
     """Машина логического вывода"""
 
-    def __init__(self, db_path):
+    def __init__(self, db_path, database=None, incremental=True, check_interval=0):
         self.db_path = db_path
+        self.database = database or Database(db_path)
         self.fuzzy_logic = FuzzyLogic()
-
-    def evaluate_conditions(self, measurements):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT id, name, condition, action, priority FROM rules ORDER BY priority')
-        rules = cursor.fetchall()
-
-        activated_rules = []
-
-        for rule_id, name, condition, action, priority in rules:
-            try:
-                eval_condition = condition
-                for key, value in measurements.items():
-                    eval_condition = eval_condition.replace(key, str(value))
-
-                if eval(eval_condition):
-                    activated_rules.append({
-                        'id': rule_id,
-                        'name': name,
-                        'action': action,
-                        'priority': priority
-                    })
-            except Exception as e:
-                print(f"Ошибка в правиле {name}: {e}")
-
-        conn.close()
-        return activated_rules
-
+        self.incremental = incremental
+        # Онтология и правила в памяти; изменения в базе проверяются по счетчику версии
+        # (при каждом обращении или не чаще раза в check_interval секунд)
+        self.catalog_cache = CatalogCache(self.database, check_interval)
+        self._catalog = None
+        self._matcher = None
+        self._fuzzy_system = None
+
+    @property
+    def catalog(self):
+        catalog = self.catalog_cache.get()
+        if catalog is not self._catalog:
+            # каталог изменился — зависящие от него структуры строятся заново
+            self._catalog = catalog
+            self._matcher = None
+            self._fuzzy_system = None
+            for name, error in catalog.rule_set.errors.items():
+                print(f"Ошибка в правиле {name}: {error}")
+        return catalog
+
+    @property
+    def rule_set(self):
+        """Скомпилированные правила из каталога (перечитываются при изменении таблицы rules)"""
+        return self.catalog.rule_set
+
+    @property
+    def fuzzy_system(self):
+        """Нечеткий вывод интенсивности и длительности по термам онтологии"""
+        return self.resolve()[1]
+
+    def resolve(self):
+        """
+        Правила и нечеткий вывод текущего каталога: (rule_set, fuzzy_system).
+        Версия каталога проверяется один раз — для одного решения
+        вызывается resolve(), а не оба свойства по отдельности.
+        """
+        catalog = self.catalog
+        if self._fuzzy_system is None:
+            self._fuzzy_system = FuzzyInferenceSystem.from_ontology(catalog.ontology)
+            for rule, error in self._fuzzy_system.errors.items():
+                print(f"Нечеткое правило {rule} пропущено: {error}")
+        return catalog.rule_set, self._fuzzy_system
+
+    def reload_rules(self):
+        """Сбрасывает кэш каталога (например, сразу после изменения таблицы rules)"""
+        self.catalog_cache.invalidate()
+
+    @metrics.timed('evaluate_conditions')
+    def evaluate_conditions(self, measurements, rule_set=None):
+        """Сработавшие правила; rule_set — уже полученные правила (None — из каталога)"""
+        on_error = lambda rule, e: print(f"Ошибка в правиле {rule.name}: {e}")
+        if rule_set is None:
+            rule_set = self.rule_set
+        if not self.incremental:
+            activated = rule_set.evaluate(measurements, on_error=on_error)
+        else:
+            # Между шагами пересчитываются только правила, чьи входы изменились
+            if self._matcher is None:
+                self._matcher = IncrementalMatcher(rule_set)
+            activated = self._matcher.evaluate(measurements, on_error=on_error)
+        if metrics.enabled():
+            for rule in activated:
+                metrics.increment('rule_activations', rule=rule['name'])
+        return activated
+
+    @metrics.timed('make_decision')
     def make_decision(self, measurements):
         fuzzy_pollution = self.fuzzy_logic.fuzzify_pollution(measurements['pollution_level'])
 
@@ -171,16 +251,75 @@ class InferenceEngine:
             if value > 0:
                 print(f"  {level}: {value:.2f}")
 
-        activated_rules = self.evaluate_conditions(measurements)
-        return sorted(activated_rules, key=lambda x: x['priority'])
+        # Параметры воздействия — результат нечеткого вывода
+        rule_set, fuzzy_system = self.resolve()
+        outputs = fuzzy_system.infer_one(measurements)
+        print(f"Нечеткий вывод: интенсивность={outputs['treatment_intensity']:.2f}, "
+              f"длительность={outputs['treatment_duration']:.1f} мин, "
+              f"доза pH={outputs['ph_dose']:+.2f}")
 
+        activated_rules = self.evaluate_conditions(measurements, rule_set)
+        # словари сопоставителя общие между шагами — к ним добавляются выходы в копиях
+        return sorted((dict(rule, outputs=outputs) for rule in activated_rules), key=lambda x: x['priority'])
+
+    def infer_batch(self, columns):
+        """
+        Пакетный вывод для блока измерений (словарь столбцов NumPy).
+        Каждое правило вычисляется как маска над всем блоком; для каждой строки
+        выбирается правило с наивысшим приоритетом, как в make_decision().
+        Возвращает id правила-победителя (-1 — нет), действие, фаззифицированное загрязнение
+        и четкие выходы нечеткого вывода ('control').
+        """
+        rule_set, fuzzy_system = self.resolve()
+        rules = rule_set.rules
+        winners = rule_set.evaluate_batch(
+            columns, on_error=lambda rule, e: print(f"Ошибка в правиле {rule.name}: {e}"))
+        rule_ids = np.array([rule.id for rule in rules] + [-1])
+        actions = np.array([rule.action for rule in rules] + [None], dtype=object)
+        return {
+            'rule_id': rule_ids[winners],
+            'action': actions[winners],
+            'fuzzy_pollution': self.fuzzy_logic.fuzzify_pollution_batch(columns['pollution_level']),
+            'control': fuzzy_system.infer(columns)
+        }
+
+    def replay_measurements(self, block_size=100000):
+        """
+        Повторный вывод по всей таблице measurements блоками по block_size строк.
+        Для каждого блока выдает (id измерений, результат infer_batch).
+        """
+        conn = self.database.connection()
+        last_id = -1
+        while True:
+            rows = conn.execute(
+                f'SELECT id, {", ".join(MEASUREMENT_COLUMNS)} FROM measurements '
+                'WHERE id > ? ORDER BY id LIMIT ?', (last_id, block_size)).fetchall()
+            if not rows:
+                break
+            data = np.array(rows, dtype=float)
+            ids = data[:, 0].astype(np.int64)
+            columns = {name: data[:, i + 1] for i, name in enumerate(MEASUREMENT_COLUMNS)}
+            yield ids, self.infer_batch(columns)
+            last_id = int(ids[-1])
 
-class WaterTreatmentSimulator:
-    """Симулятор очистных сооружений"""
 
-    def __init__(self):
-        self.system = WaterTreatmentSystem()
-        self.inference_engine = InferenceEngine(self.system.db_path)
+class WaterTreatmentSimulator:
+    """
+    Симулятор очистных сооружений.
+    windows — длины скользящих окон для производных признаков
+    (например pollution_level_trend_5), доступных в условиях правил;
+    decimator — правило прореживания записи измерений (streaming.Decimator),
+    None — записывается каждое измерение.
+    """
+
+    def __init__(self, db_path='water_treatment.db', batch_size=100, flush_interval=1.0,
+                 windows=(5, 20), decimator=None):
+        self.system = WaterTreatmentSystem(db_path)
+        self.inference_engine = InferenceEngine(self.system.db_path, self.system.database)
+        # Измерения и действия пишутся пакетами через одно соединение
+        self.writer = BufferedWriter(self.system.database, batch_size, flush_interval)
+        self.features = StreamingFeatures(windows) if windows else None
+        self.decimator = decimator
         self.current_state = {
             'pollution_level': 0.5,
             'water_flow': 100.0,
@@ -189,32 +328,19 @@ class WaterTreatmentSimulator:
             'oxygen_level': 5.0
         }
 
+    @metrics.timed('save_measurement')
     def save_measurement(self, measurements):
-        conn = sqlite3.connect(self.system.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO measurements 
-            (pollution_level, water_flow, ph_level, temperature, oxygen_level)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (measurements['pollution_level'], measurements['water_flow'],
-              measurements['ph_level'], measurements['temperature'],
-              measurements['oxygen_level']))
-
-        conn.commit()
-        conn.close()
+        if self.decimator is None or self.decimator.accept(measurements):
+            self.writer.add_measurement(measurements)
 
+    @metrics.timed('save_action')
     def save_action(self, action_type, intensity, duration):
-        conn = sqlite3.connect(self.system.db_path)
-        cursor = conn.cursor()
+        self.writer.add_action(action_type, intensity, duration)
 
-        cursor.execute('''
-            INSERT INTO actions (action_type, intensity, duration)
-            VALUES (?, ?, ?)
-        ''', (action_type, intensity, duration))
-
-        conn.commit()
-        conn.close()
+    def close(self):
+        """Сбрасывает буфер записи на диск и закрывает соединения"""
+        self.writer.close()
+        self.system.database.close()
 
     def simulate_environment_change(self):
         self.current_state['pollution_level'] += random.uniform(-0.1, 0.15)
@@ -229,29 +355,25 @@ class WaterTreatmentSimulator:
         self.current_state['oxygen_level'] += random.uniform(-0.5, 0.5)
         self.current_state['oxygen_level'] = max(1.0, min(10.0, self.current_state['oxygen_level']))
 
+    @staticmethod
+    def action_parameters(outputs, intensity, duration, ph_correction=False):
+        """
+        Интенсивность и длительность воздействия: из нечеткого вывода, если он
+        был выполнен (outputs), иначе прежние фиксированные значения.
+        """
+        if outputs is None:
+            return intensity, duration
+        if ph_correction:
+            return round(abs(outputs['ph_dose']), 2), duration
+        return round(outputs['treatment_intensity'], 2), int(round(outputs['treatment_duration']))
+
     def apply_action(self, action):
-        action_type = action['action']
-
-        if action_type == 'activate_chemical_treatment':
-            self.current_state['pollution_level'] -= 0.3
-            self.save_action('chemical_treatment', 0.8, 10)
-            print("→ Применено: Усиленная химическая очистка")
-        elif action_type == 'activate_standard_treatment':
-            self.current_state['pollution_level'] -= 0.15
-            self.save_action('standard_treatment', 0.5, 8)
-            print("→ Применено: Стандартная очистка")
-        elif action_type == 'activate_minimal_treatment':
-            self.current_state['pollution_level'] -= 0.05
-            self.save_action('minimal_treatment', 0.2, 5)
-            print("→ Применено: Минимальная очистка")
-        elif action_type == 'add_alkaline':
-            self.current_state['ph_level'] += 0.3
-            self.save_action('add_alkaline', 0.4, 3)
-            print("→ Применено: Добавление щелочи")
-        elif action_type == 'add_acid':
-            self.current_state['ph_level'] -= 0.3
-            self.save_action('add_acid', 0.4, 3)
-            print("→ Применено: Добавление кислоты")
+        spec = ACTIONS.get(action['action'])
+        if spec is not None:
+            self.current_state[spec.variable] += spec.delta
+            self.save_action(spec.record, *self.action_parameters(action.get('outputs'), spec.intensity,
+                                                                  spec.duration, spec.ph_correction))
+            print(f"→ Применено: {spec.description}")
 
         self.current_state['pollution_level'] = max(0.0, min(1.0, self.current_state['pollution_level']))
         self.current_state['ph_level'] = max(4.0, min(9.0, self.current_state['ph_level']))
@@ -268,7 +390,11 @@ class WaterTreatmentSimulator:
 
             self.save_measurement(self.current_state)
 
-            decisions = self.inference_engine.make_decision(self.current_state)
+            # условия правил видят и текущие измерения, и скользящие признаки
+            state = self.current_state
+            if self.features is not None:
+                state = dict(state, **self.features.update(state))
+            decisions = self.inference_engine.make_decision(state)
 
             if decisions:
                 best_decision = decisions[0]
@@ -276,46 +402,44 @@ class WaterTreatmentSimulator:
                 self.apply_action(best_decision)
             else:
                 print("Нет подходящих правил - система в оптимальном состоянии")
-                self.save_action('no_action', 0.0, 0)
+                self.save_action(NO_ACTION, 0.0, 0)
 
             self.simulate_environment_change()
 
+        self.writer.flush()
         print(f"\n=== СИМУЛЯЦИЯ ЗАВЕРШЕНА ===")
         print("База данных 'water_treatment.db' сохранена")
         print("Содержит: онтологию, правила, измерения и действия")
 
-    def visualize_results(self):
-        """Визуализация результатов симуляции"""
-        conn = sqlite3.connect(self.system.db_path)
-
-        # Получаем данные измерений
-        query = """
-        SELECT timestamp, pollution_level, ph_level, temperature, oxygen_level 
-        FROM measurements 
-        ORDER BY timestamp
+    def visualize_results(self, max_points=2000):
         """
+        Визуализация результатов симуляции.
+        Длинные ряды прореживаются в SQLite до max_points точек на график.
+        """
+        self.writer.flush()
+        store = MeasurementStore(self.system.database)
 
-        measurements_data = conn.execute(query).fetchall()
-
-        if not measurements_data:
+        if not store.count():
             print("Нет данных для визуализации")
-            conn.close()
             return
 
-        # Подготавливаем данные для графиков
-        timestamps = [i for i in range(len(measurements_data))]
-        pollution = [row[1] for row in measurements_data]
-        ph_levels = [row[2] for row in measurements_data]
-        temperature = [row[3] for row in measurements_data]
-        oxygen = [row[4] for row in measurements_data]
-
-        conn.close()
-
-        # Создаем графики
+        # Подготавливаем данные для графиков: номер шага считаем от первого измерения
+        series = {}
+        first_id, _ = store.id_range()
+        for column in ('pollution_level', 'ph_level', 'temperature', 'oxygen_level'):
+            ids, _, values = store.downsample(column, max_points)
+            series[column] = (ids - first_id, values)
+        pollution = series['pollution_level']
+        ph_levels = series['ph_level']
+        temperature = series['temperature']
+        oxygen = series['oxygen_level']
+
+        # Создаем графики; matplotlib загружается только здесь
+        import matplotlib.pyplot as plt
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
 
         # График 1: Уровень загрязнения
-        ax1.plot(timestamps, pollution, 'r-', linewidth=2, marker='o', markersize=4)
+        ax1.plot(*pollution, 'r-', linewidth=2, marker='o', markersize=4)
         ax1.set_title('Уровень загрязнения воды', fontsize=14, fontweight='bold')
         ax1.set_ylabel('Уровень загрязнения', fontsize=12)
         ax1.set_xlabel('Шаг симуляции', fontsize=12)
@@ -329,7 +453,7 @@ class WaterTreatmentSimulator:
         ax1.legend()
 
         # График 2: Уровень pH
-        ax2.plot(timestamps, ph_levels, 'g-', linewidth=2, marker='s', markersize=4)
+        ax2.plot(*ph_levels, 'g-', linewidth=2, marker='s', markersize=4)
         ax2.set_title('Уровень pH воды', fontsize=14, fontweight='bold')
         ax2.set_ylabel('Уровень pH', fontsize=12)
         ax2.set_xlabel('Шаг симуляции', fontsize=12)
@@ -342,7 +466,7 @@ class WaterTreatmentSimulator:
         ax2.legend()
 
         # График 3: Температура
-        ax3.plot(timestamps, temperature, 'b-', linewidth=2, marker='^', markersize=4)
+        ax3.plot(*temperature, 'b-', linewidth=2, marker='^', markersize=4)
         ax3.set_title('Температура воды', fontsize=14, fontweight='bold')
         ax3.set_ylabel('Температура (°C)', fontsize=12)
         ax3.set_xlabel('Шаг симуляции', fontsize=12)
@@ -350,7 +474,7 @@ class WaterTreatmentSimulator:
         ax3.set_ylim(0, 40)
 
         # График 4: Уровень кислорода
-        ax4.plot(timestamps, oxygen, 'm-', linewidth=2, marker='d', markersize=4)
+        ax4.plot(*oxygen, 'm-', linewidth=2, marker='d', markersize=4)
         ax4.set_title('Уровень кислорода', fontsize=14, fontweight='bold')
         ax4.set_ylabel('Кислород (мг/л)', fontsize=12)
         ax4.set_xlabel('Шаг симуляции', fontsize=12)
@@ -372,12 +496,19 @@ class WaterTreatmentSimulator:
 
 
 # ЗАПУСК ПРОГРАММЫ
-if __name__ == "__main__":
+def main():
     print("Запуск системы управления очистными сооружениями...")
     simulator = WaterTreatmentSimulator()
-    simulator.run_simulation(steps=8)
+    # LABA3_PROFILE=<файл> — профиль cProfile симуляции
+    with metrics.profile(os.environ.get('LABA3_PROFILE')):
+        simulator.run_simulation(steps=8)
 
     # Создаем график после симуляции
     simulator.visualize_results()
+    simulator.close()
 
-    input("\nНажмите Enter для выхода...")
\ No newline at end of file
+    input("\nНажмите Enter для выхода...")
+
+
+if __name__ == "__main__":
+    main()
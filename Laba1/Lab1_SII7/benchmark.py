@@ -0,0 +1,165 @@
+'''Замеры производительности и качества сходимости решателей из main.py.
+
+Скрипт генерирует синтетические каталоги продуктов заданного размера
+(N продуктов, M характеристик, рацион из K продуктов), запускает на них
+генетический алгоритм, полный перебор и более быстрые методы и записывает
+время работы, число вычислений функции приспособленности в секунду,
+пиковую память и отклонение от точного оптимума в JSON и/или CSV.
+
+Пример:
+    python benchmark.py --sizes 10:4:4 60:4:5 200:8:6 --json bench.json --csv bench.csv
+'''
+
+import argparse
+import csv
+import json
+import math
+import time
+import tracemalloc
+
+import numpy as np
+
+import main as diet
+
+# Все решатели, которые умеет запускать скрипт
+SOLVERS = ["ga_list", "ga_array", "ga_cached", "islands", "brute_force", "branch_and_bound"]
+
+
+def synthetic_catalog(n, m, k, seed=0):
+    """
+    Случайный каталог из n продуктов с m характеристиками и нормы,
+    достижимые рационом из k продуктов.
+    Возвращает (продукты, нормы) в формате main.products / main.norms.
+    """
+    rng = np.random.default_rng(seed)
+    nutrients = rng.integers(0, 100, size=(n, m))
+    prices = rng.integers(5, 100, size=n)
+    products = [(f"Продукт {i}", *map(int, nutrients[i]), int(prices[i])) for i in range(n)]
+
+    # Нормы — диапазон вокруг среднего значения суммы k продуктов
+    mean = nutrients.mean(axis=0) * k
+    norms = {f"nutrient_{j}": (float(np.floor(mean[j] * 0.9)), float(np.ceil(mean[j] * 1.2)))
+             for j in range(m)}
+    return products, norms
+
+
+def _run_solver(name, args):
+    """Запускает один решатель. Возвращает (стоимость, число вычислений функции)."""
+    if name == "ga_list":
+        solution, _ = diet.genetic_algorithm(args.generations, args.pop_size, engine="list", seed=args.seed)
+        return diet.evaluate(solution), args.generations * args.pop_size
+    if name == "ga_array":
+        solution, _ = diet.genetic_algorithm(args.generations, args.pop_size, seed=args.seed)
+        return diet.evaluate(solution), args.generations * args.pop_size
+    if name == "ga_cached":
+        cache = diet.FitnessCache()
+        solution, _ = diet.genetic_algorithm(args.generations, args.pop_size, cache=cache, seed=args.seed)
+        return diet.evaluate(solution), cache.misses
+    if name == "islands":
+        solution, _, _ = diet.island_genetic_algorithm(args.generations, args.pop_size,
+                                                       islands=args.islands, seed=args.seed)
+        return diet.evaluate(solution), args.islands * args.generations * args.pop_size
+    if name == "brute_force":
+        _, cost = diet.brute_force()
+        return cost, math.comb(diet.N, diet.K)
+    if name == "branch_and_bound":
+        _, cost, stats = diet.branch_and_bound(time_budget=args.time_budget)
+        return cost, stats["explored"]
+    raise ValueError(f"Неизвестный решатель: {name}")
+
+
+def _peak_memory(name, args):
+    """Пиковый объем памяти (байты), выделенной при отдельном запуске решателя."""
+    tracemalloc.start()
+    try:
+        _run_solver(name, args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(sizes, solvers, args):
+    """
+    Прогоняет решатели на синтетических каталогах.
+    sizes — список кортежей (N, M, K). Возвращает список записей-словарей.
+    """
+    records = []
+    for n, m, k in sizes:
+        catalog, catalog_norms = synthetic_catalog(n, m, k, seed=args.seed)
+        diet.set_catalog(catalog, catalog_norms, k)
+        # Точный оптимум для оценки качества — методом ветвей и границ
+        _, optimum, exact_stats = diet.branch_and_bound(time_budget=args.time_budget)
+
+        for name in solvers:
+            if name == "brute_force" and math.comb(n, k) > args.brute_force_limit:
+                print(f"N={n} M={m} K={k}: {name} пропущен ({math.comb(n, k)} комбинаций)")
+                continue
+            for repeat in range(args.repeat):
+                start = time.perf_counter()
+                cost, evaluations = _run_solver(name, args)
+                wall_time = time.perf_counter() - start
+                record = {
+                    "solver": name,
+                    "N": n, "M": m, "K": k,
+                    "repeat": repeat,
+                    "wall_time": wall_time,
+                    "evaluations": int(evaluations),
+                    "evals_per_sec": evaluations / wall_time if wall_time > 0 else float("inf"),
+                    "cost": float(cost),
+                    "optimum": float(optimum),
+                    "optimum_exact": exact_stats["complete"],
+                    "gap": float(cost) - float(optimum),
+                    "gap_rel": (float(cost) - float(optimum)) / float(optimum) if optimum else 0.0,
+                    "peak_memory": _peak_memory(name, args) if args.memory and repeat == 0 else None
+                }
+                records.append(record)
+                print(f"N={n} M={m} K={k} {name:<17} время={wall_time:8.3f} с  "
+                      f"оценок/с={record['evals_per_sec']:12.0f}  разрыв={record['gap']:.2f}")
+    return records
+
+
+def write_results(records, json_path=None, csv_path=None):
+    """Сохраняет результаты замеров в JSON и/или CSV."""
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+    if csv_path and records:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+
+
+def parse_size(text):
+    """Разбирает размер задачи в формате N:M:K."""
+    n, m, k = map(int, text.split(":"))
+    return n, m, k
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры решателей задачи о рационе")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(10, 4, 4), (40, 4, 5)],
+                        help="размеры задачи в формате N:M:K")
+    parser.add_argument("--solvers", nargs="+", choices=SOLVERS, default=SOLVERS)
+    parser.add_argument("--generations", type=int, default=200)
+    parser.add_argument("--pop-size", type=int, default=100)
+    parser.add_argument("--islands", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="ограничение времени метода ветвей и границ, с")
+    parser.add_argument("--brute-force-limit", type=int, default=2_000_000,
+                        help="максимальное число комбинаций для полного перебора")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="не измерять пиковую память (экономит отдельный запуск)")
+    parser.add_argument("--json", help="файл для результатов в формате JSON")
+    parser.add_argument("--csv", help="файл для результатов в формате CSV")
+    args = parser.parse_args(argv)
+
+    records = run_benchmark(args.sizes, args.solvers, args)
+    write_results(records, args.json, args.csv)
+    return records
+
+
+if __name__ == "__main__":
+    main()
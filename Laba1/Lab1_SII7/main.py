@@ -8,7 +8,11 @@
 import numpy as np
 import random
 import itertools
-import matplotlib.pyplot as plt
+import csv
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 # Список продуктов: (название, калории, белки, жиры, углеводы, цена)
 products = [
@@ -36,6 +40,233 @@ norms = {
     "carbs": (300, 400)
 }
 
+# Матричное представление каталога для пакетной оценки:
+# столбцы 0..M-1 — характеристики, столбец M — цена
+products_matrix = np.array([p[1:M + 2] for p in products], dtype=float)  # (N, M+1)
+norms_low = np.array([low for low, high in norms.values()], dtype=float)    # нижние границы норм
+norms_high = np.array([high for low, high in norms.values()], dtype=float)  # верхние границы норм
+_catalog_version = 0  # номер версии каталога, меняется при каждой замене каталога
+
+class CatalogView:
+    """
+    Каталог поверх матрицы (N, M+1) «характеристики и цена»: ведет себя как список
+    кортежей (название, характеристики..., цена), но создает кортеж только при обращении.
+    names — названия продуктов (None — «Продукт <номер>»),
+    index — номера строк в исходном файле (после отбора продуктов).
+    """
+
+    def __init__(self, matrix, names=None, index=None):
+        self.matrix = matrix
+        self.names = names
+        self.index = index
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def __getitem__(self, i):
+        if self.names is not None:
+            name = self.names[i]
+        else:
+            name = f"Продукт {self.index[i] if self.index is not None else i}"
+        return (name, *self.matrix[i].tolist())
+
+def set_catalog(new_products, new_norms, k=None):
+    """
+    Заменяет каталог продуктов и медицинские нормы
+    и пересчитывает N, M, K (k=None — оставить текущее K)
+    и матричное представление каталога.
+    new_products — список кортежей или CatalogView (матрица используется без копирования).
+    """
+    global products, norms, N, M, K, products_matrix, norms_low, norms_high, _catalog_version
+    products = new_products if isinstance(new_products, CatalogView) else list(new_products)
+    norms = dict(new_norms)
+    N, M = len(products), len(norms)
+    K = K if k is None else k
+    if isinstance(products, CatalogView):
+        products_matrix = np.asarray(products.matrix, dtype=float)
+    else:
+        products_matrix = np.array([p[1:M + 2] for p in products], dtype=float)
+    norms_low = np.array([low for low, high in norms.values()], dtype=float)
+    norms_high = np.array([high for low, high in norms.values()], dtype=float)
+    _catalog_version += 1
+
+# ЗАГРУЗКА БОЛЬШИХ КАТАЛОГОВ ИЗ ФАЙЛОВ
+
+def _read_csv_chunks(path, columns, name_column, chunk_rows):
+    """
+    Потоково читает CSV с заголовком и выдает блоки (названия, матрица)
+    по chunk_rows строк; columns — столбцы матрицы в нужном порядке.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(column) for column in columns]
+        name_pos = header.index(name_column) if name_column in header else None
+        names, rows = [], []
+        for record in reader:
+            if not record:
+                continue
+            rows.append([record[p] for p in positions])
+            if name_pos is not None:
+                names.append(record[name_pos])
+            if len(rows) == chunk_rows:
+                yield names, np.array(rows, dtype=float)
+                names, rows = [], []
+        if rows:
+            yield names, np.array(rows, dtype=float)
+
+def convert_csv_to_npy(csv_path, npy_path, nutrients, price_column="price", name_column="name",
+                       chunk_rows=65536):
+    """
+    Переводит CSV-каталог в двоичный .npy (столбцы: характеристики nutrients, затем цена)
+    без загрузки всего файла в память; названия сохраняются рядом в <npy_path>.names.txt.
+    Возвращает число продуктов.
+    """
+    with open(csv_path, encoding="utf-8") as f:
+        count = sum(1 for line in f if line.strip()) - 1  # строки без заголовка
+    matrix = np.lib.format.open_memmap(npy_path, mode="w+", dtype=np.float64,
+                                       shape=(count, len(nutrients) + 1))
+    written = 0
+    with open(npy_path + ".names.txt", "w", encoding="utf-8") as names_file:
+        for names, block in _read_csv_chunks(csv_path, list(nutrients) + [price_column],
+                                             name_column, chunk_rows):
+            matrix[written:written + len(block)] = block
+            written += len(block)
+            names_file.writelines(name + "\n" for name in names)
+    matrix.flush()
+    del matrix
+    return written
+
+def _cheapest(values, index, pool_size):
+    """pool_size самых дешевых продуктов в строгом порядке (цена, номер)."""
+    order = np.lexsort((index, values[:, -1]))[:pool_size]
+    return values[order], index[order]
+
+def _dominator_counts(block, rows, pool_values, pool_index):
+    """Число продуктов пула, доминирующих над каждым продуктом блока (rows — их номера)."""
+    # строгий порядок (цена, номер) исключает взаимное доминирование одинаковых продуктов
+    earlier = (pool_values[None, :, -1] < block[:, -1, None]) | \
+              ((pool_values[None, :, -1] == block[:, -1, None]) & (pool_index[None, :] < rows[:, None]))
+    # Расстояние = цена кандидата + L1-расстояние по характеристикам. Сначала пары
+    # отсеиваются по нижней оценке |сумма a - сумма b|, затем расстояние накапливается
+    # по характеристикам только для пар, еще не превысивших цену продукта
+    pool_totals = pool_values[:, :-1].sum(axis=1)
+    bound = pool_values[None, :, -1] + np.abs(block[:, :-1].sum(axis=1)[:, None] - pool_totals[None, :])
+    r, c = np.nonzero(earlier & (bound <= block[:, -1, None]))
+    distance = pool_values[c, -1]
+    for j in range(block.shape[1] - 1):
+        distance = distance + np.abs(block[r, j] - pool_values[c, j])
+        alive = distance <= block[r, -1]
+        r, c, distance = r[alive], c[alive], distance[alive]
+    return np.bincount(r, minlength=len(block))
+
+def prefilter_dominated(matrix, k, pool_size=256, block_rows=1024):
+    """
+    Отбор продуктов, которые заведомо не нужны оптимальному рациону.
+    Продукт a доминирует над b, если цена a плюс сумма |a_j - b_j| по характеристикам
+    не больше цены b (штраф за нормы растет не быстрее этой суммы), так что замена b
+    на a не ухудшает рацион. Продукт отбрасывается, если у него не меньше k доминирующих
+    среди pool_size самых дешевых продуктов — тогда хотя бы один из них свободен в любом
+    рационе. Матрица просматривается блоками, поэтому подходит и для memmap.
+    Возвращает булеву маску оставляемых продуктов.
+    """
+    n = len(matrix)
+    prices = np.asarray(matrix[:, -1], dtype=float)
+    pool = np.argsort(prices, kind="stable")[:pool_size]
+    pool_values = np.asarray(matrix[pool], dtype=float)
+    keep = np.ones(n, dtype=bool)
+    for start in range(0, n, block_rows):
+        block = np.asarray(matrix[start:start + block_rows], dtype=float)
+        rows = np.arange(start, start + len(block))
+        keep[rows] = _dominator_counts(block, rows, pool_values, pool) < k
+    return keep
+
+def prefilter_chunks(chunks, k, pool_size=256, block_rows=1024):
+    """
+    Потоковый вариант prefilter_dominated для каталога, читаемого блоками (названия, матрица):
+    в памяти остаются только прошедшие отбор продукты и текущий блок.
+    Каждый блок сразу проверяется по пулу самых дешевых продуктов, прочитанных к этому
+    моменту (k доминирующих среди любых продуктов достаточно, чтобы продукт был не нужен),
+    а в конце оставшиеся проверяются по пулу всего каталога. Поэтому остаются только
+    продукты, которые оставил бы и prefilter_dominated.
+    Возвращает (матрица, названия или None, номера оставленных строк, всего продуктов).
+    """
+    pool_values, pool_index = None, np.empty(0, dtype=np.int64)
+    kept, kept_names, kept_index = [], [], []
+    loaded = 0
+    for names, block in chunks:
+        rows = np.arange(loaded, loaded + len(block))
+        loaded += len(block)
+        if pool_values is None:
+            pool_values = np.empty((0, block.shape[1]))
+        pool_values, pool_index = _cheapest(np.concatenate([pool_values, block]),
+                                            np.concatenate([pool_index, rows]), pool_size)
+        keep = np.concatenate([_dominator_counts(block[i:i + block_rows], rows[i:i + block_rows],
+                                                 pool_values, pool_index) < k
+                               for i in range(0, len(block), block_rows)])
+        kept.append(block[keep])
+        kept_index.append(rows[keep])
+        if names:
+            kept_names.extend(np.array(names, dtype=object)[keep])
+    if pool_values is None:
+        return np.empty((0, 0)), None, np.empty(0, dtype=np.int64), 0
+
+    matrix, index = np.concatenate(kept), np.concatenate(kept_index)
+    names = np.array(kept_names, dtype=object) if kept_names else None
+    keep = np.ones(len(matrix), dtype=bool)
+    for i in range(0, len(matrix), block_rows):
+        keep[i:i + block_rows] = _dominator_counts(matrix[i:i + block_rows], index[i:i + block_rows],
+                                                   pool_values, pool_index) < k
+    return matrix[keep], (names[keep] if names is not None else None), index[keep], loaded
+
+def load_catalog(path, catalog_norms, k=None, price_column="price", name_column="name",
+                 prefilter=True, chunk_rows=65536):
+    """
+    Загружает каталог из CSV или .npy и делает его текущим (через set_catalog).
+    Число характеристик M задается нормами: для CSV берутся столбцы с именами норм,
+    для .npy — первые M столбцов и последний (цена); .npy открывается через memmap.
+    prefilter — отбросить доминируемые продукты (prefilter_chunks) до запуска решателей;
+    файл тогда читается блоками по chunk_rows строк, и в памяти остаются только
+    оставленные продукты.
+    Возвращает статистику загрузки.
+    """
+    start = time.perf_counter()
+    k = K if k is None else k
+    nutrients = list(catalog_norms)
+    names = None
+    index = None
+    if path.endswith(".npy"):
+        source = np.load(path, mmap_mode="r")
+        columns = list(range(len(nutrients))) + [source.shape[1] - 1]
+        if os.path.exists(path + ".names.txt"):
+            with open(path + ".names.txt", encoding="utf-8") as f:
+                names = np.array(f.read().splitlines(), dtype=object)
+        if prefilter:
+            # из memmap читаются только нужные столбцы очередного блока
+            chunks = ((None, np.asarray(source[i:i + chunk_rows, columns], dtype=float))
+                      for i in range(0, len(source), chunk_rows))
+            matrix, _, index, loaded = prefilter_chunks(chunks, k)
+            names = names[index] if names is not None else None
+        else:
+            matrix = source if source.shape[1] == len(columns) else source[:, columns]
+            loaded = len(matrix)
+    else:
+        chunks = _read_csv_chunks(path, nutrients + [price_column], name_column, chunk_rows)
+        if prefilter:
+            matrix, names, index, loaded = prefilter_chunks(chunks, k)
+        else:
+            chunks = list(chunks)
+            matrix = np.concatenate([block for _, block in chunks]) if chunks \
+                else np.empty((0, len(nutrients) + 1))
+            if chunks and chunks[0][0]:
+                names = np.array([name for chunk_names, _ in chunks for name in chunk_names], dtype=object)
+            loaded = len(matrix)
+
+    if loaded == 0:
+        matrix = np.empty((0, len(nutrients) + 1))
+    set_catalog(CatalogView(matrix, names, index), catalog_norms, k)
+    return {"loaded": loaded, "kept": N, "seconds": time.perf_counter() - start}
+
 # ФУНКЦИЯ ПРИСПОСОБЛЕННОСТИ
 
 def evaluate(chromosome):
@@ -45,26 +276,92 @@ def evaluate(chromosome):
     """
     chosen = [products[i] for i in chromosome]
 
-    # Суммируем характеристики по выбранным продуктам
-    total_cal = sum(p[1] for p in chosen)
-    total_prot = sum(p[2] for p in chosen)
-    total_fat = sum(p[3] for p in chosen)
-    total_carb = sum(p[4] for p in chosen)
-    total_cost = sum(p[5] for p in chosen)
+    # Суммарная цена выбранных продуктов (последний столбец)
+    total_cost = sum(p[M + 1] for p in chosen)
 
-    # Штраф за выход за пределы нормы
+    # Штраф за выход за пределы нормы по каждой характеристике
     penalty = 0
-    if not (norms["calories"][0] <= total_cal <= norms["calories"][1]):
-        penalty += abs(total_cal - np.clip(total_cal, *norms["calories"]))
-    if not (norms["protein"][0] <= total_prot <= norms["protein"][1]):
-        penalty += abs(total_prot - np.clip(total_prot, *norms["protein"]))
-    if not (norms["fat"][0] <= total_fat <= norms["fat"][1]):
-        penalty += abs(total_fat - np.clip(total_fat, *norms["fat"]))
-    if not (norms["carbs"][0] <= total_carb <= norms["carbs"][1]):
-        penalty += abs(total_carb - np.clip(total_carb, *norms["carbs"]))
+    for j, (low, high) in enumerate(norms.values(), start=1):
+        total = sum(p[j] for p in chosen)
+        if not (low <= total <= high):
+            penalty += abs(total - np.clip(total, low, high))
 
     return total_cost + penalty
 
+def evaluate_batch(population):
+    """
+    Пакетная (векторная) оценка всей популяции за один вызов.
+    population — массив индексов продуктов формы (pop_size, K).
+    Возвращает массив значений функции приспособленности формы (pop_size,),
+    совпадающих с evaluate() для каждой хромосомы.
+    """
+    idx = np.asarray(population, dtype=np.intp).reshape(-1, K)
+    totals = products_matrix[idx].sum(axis=1)  # (pop_size, M+1): суммы характеристик и цены
+    nutrients = totals[:, :M]
+    # Штраф — суммарное расстояние до допустимых диапазонов норм
+    penalty = np.abs(nutrients - np.clip(nutrients, norms_low, norms_high)).sum(axis=1)
+    return totals[:, M] + penalty
+
+# КЭШ ЗНАЧЕНИЙ ФУНКЦИИ ПРИСПОСОБЛЕННОСТИ
+
+class FitnessCache:
+    """
+    Ограниченный LRU-кэш значений функции приспособленности.
+    Ключ — отсортированный кортеж индексов продуктов, поэтому рационы,
+    отличающиеся только порядком генов, оцениваются один раз.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._version = _catalog_version
+
+    def __len__(self):
+        return len(self._data)
+
+    def evaluate(self, population):
+        """Оценивает популяцию, вычисляя (одним пакетом) только рационы, которых нет в кэше."""
+        if self._version != _catalog_version:
+            # Каталог заменен — сохраненные значения больше не действительны
+            self._data.clear()
+            self._version = _catalog_version
+
+        result = np.empty(len(population))
+        missing = {}  # ключ -> позиции в популяции
+        rows = np.sort(np.asarray(population, dtype=np.int64).reshape(-1, K), axis=1).tolist()
+        for pos, row in enumerate(rows):
+            key = tuple(row)
+            value = self._data.get(key)
+            if value is None:
+                missing.setdefault(key, []).append(pos)
+            else:
+                self._data.move_to_end(key)
+                result[pos] = value
+                self.hits += 1
+
+        if missing:
+            values = evaluate_batch(list(missing))
+            for (key, positions), value in zip(missing.items(), values):
+                result[positions] = value
+                self._data[key] = value
+                self.misses += 1
+                self.hits += len(positions) - 1  # повторы внутри одного поколения
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)  # вытесняем давно не использованные рационы
+        return result
+
+    def stats(self):
+        """Счетчики попаданий и промахов (промах = реальное вычисление функции)."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
 # ВСПОМОГАТЕЛЬНАЯ ФУНКЦИЯ
 
 def repair_chromosome(chrom):
@@ -132,33 +429,385 @@ def selection(pop, fitnesses):
     i, j = random.sample(range(len(pop)), 2)
     return pop[i] if fitnesses[i] < fitnesses[j] else pop[j]
 
+# --- Популяция в виде массива (пакетные операторы) ---
+def repair_batch(candidates, valid, rng):
+    """
+    Пакетный аналог repair_chromosome() для массива кандидатов формы (P, L):
+    в каждой строке оставляет первые вхождения допустимых (valid) генов по порядку,
+    берет первые K из них и дополняет нехватку случайными продуктами без повторов.
+    """
+    length = candidates.shape[1]
+    earlier = np.tri(length, length, -1, dtype=bool)  # [j, l] — позиция l левее j
+    same = candidates[:, :, None] == candidates[:, None, :]
+    duplicate = (same & earlier & valid[:, None, :]).any(axis=2)
+    keep = valid & ~duplicate
+
+    # Сдвигаем оставленные гены в начало строки, сохраняя порядок
+    order = np.argsort(~keep, axis=1, kind="stable")[:, :K]
+    genes = np.take_along_axis(candidates, order, axis=1)
+    filled = np.take_along_axis(keep, order, axis=1)
+
+    # Пустые позиции заполняем случайными продуктами, повторяя розыгрыш при совпадениях
+    earlier = np.tri(K, K, -1, dtype=bool)
+    other = ~np.eye(K, dtype=bool)
+    rows = np.flatnonzero(~filled.all(axis=1))
+    while len(rows):
+        sub_genes, sub_filled = genes[rows], filled[rows]
+        sub_genes[~sub_filled] = rng.integers(N, size=np.count_nonzero(~sub_filled))
+        # новый ген конфликтует с заполненными генами и с новыми генами левее себя
+        blocking = sub_filled[:, None, :] | earlier
+        same = sub_genes[:, :, None] == sub_genes[:, None, :]
+        conflict = (same & blocking & other).any(axis=2)
+        sub_filled |= ~conflict
+        genes[rows], filled[rows] = sub_genes, sub_filled
+        rows = rows[~sub_filled.all(axis=1)]
+    return genes
+
+def _distinct_pairs(rng, size, high):
+    """Пары различных случайных чисел из range(high) для каждой из size строк."""
+    i = rng.integers(high, size=size)
+    j = rng.integers(high - 1, size=size)
+    return i, j + (j >= i)
+
+def crossover_one_point_batch(p1, p2, rng):
+    """Одноточечный кроссовер для всех пар родителей сразу"""
+    point = rng.integers(1, K, size=len(p1))
+    valid = np.hstack([np.arange(K) < point[:, None], np.ones_like(p2, dtype=bool)])
+    return repair_batch(np.hstack([p1, p2]), valid, rng)
+
+def crossover_two_point_batch(p1, p2, rng):
+    """Двухточечный кроссовер для всех пар родителей сразу"""
+    a, b = _distinct_pairs(rng, len(p1), K)
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    cols = np.arange(K)
+    valid = np.hstack([cols < a[:, None], (cols >= a[:, None]) & (cols < b[:, None]),
+                       np.ones_like(p1, dtype=bool)])
+    return repair_batch(np.hstack([p1, p2, p1]), valid, rng)
+
+def crossover_uniform_batch(p1, p2, rng):
+    """Равномерный кроссовер для всех пар родителей сразу"""
+    child = np.where(rng.random(p1.shape) < 0.5, p1, p2)
+    return repair_batch(child, np.ones_like(child, dtype=bool), rng)
+
+def mutation_swap_batch(chroms, rng):
+    """Меняем местами два продукта в каждом рационе"""
+    if K < 2:
+        return chroms
+    rows = np.arange(len(chroms))
+    i, j = _distinct_pairs(rng, len(chroms), K)
+    chroms[rows, i], chroms[rows, j] = chroms[rows, j], chroms[rows, i]
+    return chroms
+
+def mutation_replace_batch(chroms, rng):
+    """Заменяем в каждом рационе один продукт на случайный другой"""
+    chroms[np.arange(len(chroms)), rng.integers(K, size=len(chroms))] = rng.integers(N, size=len(chroms))
+    return repair_batch(chroms, np.ones_like(chroms, dtype=bool), rng)
+
+def mutation_shuffle_batch(chroms, rng):
+    """Перемешиваем продукты внутри каждого рациона"""
+    return np.take_along_axis(chroms, np.argsort(rng.random(chroms.shape), axis=1), axis=1)
+
+def selection_batch(fitnesses, count, rng):
+    """Турнирная селекция: индексы count победителей турниров из двух особей"""
+    i, j = _distinct_pairs(rng, count, len(fitnesses))
+    return np.where(fitnesses[i] < fitnesses[j], i, j)
+
+CROSSOVERS_BATCH = [crossover_one_point_batch, crossover_two_point_batch, crossover_uniform_batch]
+MUTATIONS_BATCH = [mutation_swap_batch, mutation_replace_batch, mutation_shuffle_batch]
+
+class AdaptiveOperators:
+    """
+    Адаптивный выбор операторов (probability matching): вероятность оператора
+    смещается к тем, кто недавно давал потомков лучше лучшего из родителей.
+    min_prob — минимальная вероятность, чтобы ни один оператор не исчез,
+    decay — доля, с которой учитываются результаты прошлых поколений.
+    """
+
+    def __init__(self, operators, min_prob=0.05, decay=0.9):
+        self.names = [op.__name__.replace("_batch", "") for op in operators]
+        self.min_prob = min_prob
+        self.decay = decay
+        self.uses = np.zeros(len(operators), dtype=np.int64)
+        self.successes = np.zeros(len(operators), dtype=np.int64)
+        # Затухающие счетчики: недавние поколения весят больше старых
+        self._recent_uses = np.zeros(len(operators))
+        self._recent_successes = np.zeros(len(operators))
+
+    def probabilities(self):
+        """Текущие вероятности выбора операторов."""
+        quality = (self._recent_successes + 1) / (self._recent_uses + 2)
+        share = quality / quality.sum()
+        return self.min_prob + (1 - len(share) * self.min_prob) * share
+
+    def update(self, op_ids, improved):
+        """Учитывает результаты поколения: op_ids — оператор каждого потомка, improved — успех."""
+        uses = np.bincount(op_ids, minlength=len(self.names))
+        successes = np.bincount(op_ids, weights=improved, minlength=len(self.names)).astype(np.int64)
+        self.uses += uses
+        self.successes += successes
+        self._recent_uses = self.decay * self._recent_uses + uses
+        self._recent_successes = self.decay * self._recent_successes + successes
+
+    def report(self):
+        """Статистика успешности по каждому оператору."""
+        return {
+            name: {
+                "uses": int(uses),
+                "successes": int(successes),
+                "success_rate": successes / uses if uses else 0.0,
+                "probability": float(prob)
+            }
+            for name, uses, successes, prob in zip(self.names, self.uses, self.successes, self.probabilities())
+        }
+
+class ArrayPopulation:
+    """
+    Популяция в виде одного непрерывного массива индексов формы (pop_size, K).
+    Селекция, кроссоверы, мутации и исправление дубликатов выполняются
+    пакетно для всего поколения, без отдельных объектов на каждую особь.
+    """
+
+    def __init__(self, genes, rng):
+        self.genes = np.ascontiguousarray(genes, dtype=np.int64)
+        self.rng = rng
+        # Происхождение особей (заполняется в breed): лучшая оценка родителей и операторы
+        self.parent_fitness = None
+        self.cross_ops = None
+        self.mut_ops = None
+
+    @classmethod
+    def random(cls, pop_size, rng):
+        """Начальная популяция из случайных рационов."""
+        genes = rng.integers(N, size=(pop_size, K))
+        return cls(repair_batch(genes, np.ones_like(genes, dtype=bool), rng), rng)
+
+    def __len__(self):
+        return len(self.genes)
+
+    def breed(self, fitnesses, cross_probs=None, mut_probs=None):
+        """
+        Новое поколение: селекция, случайный кроссовер и случайная мутация для каждой особи.
+        cross_probs, mut_probs — вероятности операторов (None — равновероятный выбор).
+        """
+        size = len(self.genes)
+        i1 = selection_batch(fitnesses, size, self.rng)
+        i2 = selection_batch(fitnesses, size, self.rng)
+        p1, p2 = self.genes[i1], self.genes[i2]
+        if cross_probs is None:
+            cross_ops = self.rng.integers(len(CROSSOVERS_BATCH), size=size)
+        else:
+            cross_ops = self.rng.choice(len(CROSSOVERS_BATCH), size=size, p=cross_probs)
+        if mut_probs is None:
+            mut_ops = self.rng.integers(len(MUTATIONS_BATCH), size=size)
+        else:
+            mut_ops = self.rng.choice(len(MUTATIONS_BATCH), size=size, p=mut_probs)
+
+        children = np.empty_like(self.genes)
+        for op_id, cross in enumerate(CROSSOVERS_BATCH):
+            mask = cross_ops == op_id
+            if mask.any():
+                children[mask] = cross(p1[mask], p2[mask], self.rng)
+        for op_id, mut in enumerate(MUTATIONS_BATCH):
+            mask = mut_ops == op_id
+            if mask.any():
+                children[mask] = mut(children[mask], self.rng)
+        offspring = ArrayPopulation(children, self.rng)
+        offspring.parent_fitness = np.minimum(fitnesses[i1], fitnesses[i2])
+        offspring.cross_ops, offspring.mut_ops = cross_ops, mut_ops
+        return offspring
+
+# --- Смена поколения ---
+def next_generation(pop, fitnesses):
+    """Формирует новое поколение: селекция, случайный кроссовер и случайная мутация."""
+    new_pop = []
+    for _ in range(len(pop)):
+        # выбираем родителей
+        p1, p2 = selection(pop, fitnesses), selection(pop, fitnesses)
+        # случайный кроссовер
+        cross = random.choice([crossover_one_point, crossover_two_point, crossover_uniform])
+        child = cross(p1.copy(), p2.copy())
+        # случайная мутация
+        mut = random.choice([mutation_swap, mutation_replace, mutation_shuffle])
+        child = mut(child)
+        new_pop.append(child)
+    return new_pop
+
+def _operator_probabilities(weights, operators):
+    """Веса операторов -> вероятности выбора (None остается None)."""
+    if weights is None:
+        return None
+    weights = np.asarray(weights, dtype=float)
+    if len(weights) != len(operators) or (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError(f"Нужно {len(operators)} неотрицательных веса с положительной суммой")
+    return weights / weights.sum()
+
 # --- Основной цикл генетического алгоритма ---
-def genetic_algorithm(generations=100, pop_size=50):
-    pop = initialize_population(pop_size)  # начальная популяция
+def genetic_algorithm(generations=100, pop_size=50, cache=None, engine="array", seed=None,
+                      stagnation=None, target_cost=None, time_budget=None, adaptive=False, report=None,
+                      crossover_weights=None, mutation_weights=None):
+    """
+    Генетический алгоритм.
+    cache — FitnessCache для повторно встречающихся рационов (None — без кэша),
+    engine — "array" (популяция ArrayPopulation, пакетные операторы)
+    или "list" (список списков и поштучные операторы),
+    seed — зерно генератора случайных чисел для воспроизводимости.
+    Критерии досрочной остановки: stagnation — число поколений без улучшения,
+    target_cost — достаточная стоимость, time_budget — ограничение времени в секундах.
+    adaptive — адаптивный выбор кроссоверов и мутаций (только для engine="array").
+    crossover_weights, mutation_weights — постоянные веса операторов в порядке
+    CROSSOVERS_BATCH и MUTATIONS_BATCH (None — равновероятный выбор;
+    только для engine="array" без adaptive).
+    report — словарь, в который записываются число поколений и вычислений,
+    причина остановки и статистика операторов.
+    """
+    if adaptive and engine != "array":
+        raise ValueError("Адаптивный выбор операторов поддерживается только для engine='array'")
+    if (crossover_weights is not None or mutation_weights is not None) and (adaptive or engine != "array"):
+        raise ValueError("Веса операторов задаются только для engine='array' без адаптивного выбора")
+    cross_probs = _operator_probabilities(crossover_weights, CROSSOVERS_BATCH)
+    mut_probs = _operator_probabilities(mutation_weights, MUTATIONS_BATCH)
+    score = cache.evaluate if cache is not None else evaluate_batch
+    crossovers = AdaptiveOperators(CROSSOVERS_BATCH) if adaptive else None
+    mutations = AdaptiveOperators(MUTATIONS_BATCH) if adaptive else None
+    start = time.perf_counter()
+    if engine == "array":
+        pop = ArrayPopulation.random(pop_size, np.random.default_rng(seed))
+    else:
+        if seed is not None:
+            random.seed(seed)
+        pop = initialize_population(pop_size)  # начальная популяция
     best_scores = []                       # история лучших значений
     best_solution = None                   # лучшее решение
+    best_fitness = float("inf")            # его значение функции приспособленности
+    best_gen = 0                           # поколение последнего улучшения
+    stop_reason = "generations"
 
     for gen in range(generations):
-        fitnesses = [evaluate(ind) for ind in pop]  # оценка популяции
-        best_idx = np.argmin(fitnesses)
-        if best_solution is None or fitnesses[best_idx] < evaluate(best_solution):
-            best_solution = pop[best_idx]           # сохраняем лучшее решение
-        best_scores.append(min(fitnesses))
-
-        new_pop = []
-        for _ in range(pop_size):
-            # выбираем родителей
-            p1, p2 = selection(pop, fitnesses), selection(pop, fitnesses)
-            # случайный кроссовер
-            cross = random.choice([crossover_one_point, crossover_two_point, crossover_uniform])
-            child = cross(p1.copy(), p2.copy())
-            # случайная мутация
-            mut = random.choice([mutation_swap, mutation_replace, mutation_shuffle])
-            child = mut(child)
-            new_pop.append(child)
-        pop = new_pop
+        genes = pop.genes if engine == "array" else pop
+        fitnesses = score(genes)  # пакетная оценка популяции
+        if adaptive and pop.cross_ops is not None:
+            # успех оператора — потомок лучше лучшего из родителей
+            improved = fitnesses < pop.parent_fitness
+            crossovers.update(pop.cross_ops, improved)
+            mutations.update(pop.mut_ops, improved)
+        best_idx = int(np.argmin(fitnesses))
+        if fitnesses[best_idx] < best_fitness:
+            best_solution = list(map(int, genes[best_idx]))  # сохраняем лучшее решение
+            best_fitness = fitnesses[best_idx]
+            best_gen = gen
+        best_scores.append(float(fitnesses[best_idx]))
+
+        # Досрочная остановка
+        if target_cost is not None and best_fitness <= target_cost:
+            stop_reason = "target_cost"
+            break
+        if stagnation is not None and gen - best_gen >= stagnation:
+            stop_reason = "stagnation"
+            break
+        if time_budget is not None and time.perf_counter() - start > time_budget:
+            stop_reason = "time_budget"
+            break
+
+        if engine == "array":
+            if adaptive:
+                pop = pop.breed(fitnesses, crossovers.probabilities(), mutations.probabilities())
+            else:
+                pop = pop.breed(fitnesses, cross_probs, mut_probs)
+        else:
+            pop = next_generation(pop, fitnesses)
+
+    if report is not None:
+        report.update({
+            "generations": len(best_scores),
+            "evaluations": cache.misses if cache is not None else len(best_scores) * pop_size,
+            "stop_reason": stop_reason,
+            "elapsed": time.perf_counter() - start
+        })
+        if adaptive:
+            report["crossovers"] = crossovers.report()
+            report["mutations"] = mutations.report()
     return best_solution, best_scores
 
+# --- Островная модель (параллельный ГА) ---
+def _init_island_worker(catalog, catalog_norms, k):
+    """Передает рабочему процессу каталог и нормы основного процесса."""
+    set_catalog(catalog, catalog_norms, k)
+
+def _evolve_island(genes, fitnesses, rng, pop_size, generations, best=None):
+    """
+    Эволюция одного острова в течение эпохи (между миграциями).
+    Генератор случайных чисел передается вместе с состоянием острова,
+    поэтому результат не зависит от того, какой процесс выполнил эпоху.
+    best — лучшая за все время особь острова (хромосома, значение) или None;
+    обновляется по каждому оцененному поколению и возвращается вместе с состоянием.
+    """
+    def remember(pop, fitnesses, best):
+        i = int(np.argmin(fitnesses))
+        if best is None or fitnesses[i] < best[1]:
+            return pop.genes[i].tolist(), float(fitnesses[i])
+        return best
+
+    if genes is None:
+        pop = ArrayPopulation.random(pop_size, rng)
+        fitnesses = evaluate_batch(pop.genes)
+    else:
+        pop = ArrayPopulation(genes, rng)
+    best = remember(pop, fitnesses, best)
+    history = []
+    for gen in range(generations):
+        history.append(float(np.min(fitnesses)))
+        pop = pop.breed(fitnesses)
+        fitnesses = evaluate_batch(pop.genes)
+        best = remember(pop, fitnesses, best)
+    return pop.genes, fitnesses, pop.rng, history, best
+
+def island_genetic_algorithm(generations=100, pop_size=50, islands=4, migration_interval=10,
+                             migrants=2, seed=0, workers=None):
+    """
+    Островная модель ГА: несколько независимых популяций развиваются
+    в пуле процессов, а каждые migration_interval поколений лучшие migrants
+    особей каждого острова заменяют худших на следующем острове (кольцо).
+    Возвращает лучшее решение, историю лучших значений по всем островам
+    и истории сходимости каждого острова.
+    """
+    states = [np.random.default_rng([seed, i]) for i in range(islands)]
+    pops = [None] * islands
+    fits = [None] * islands
+    bests = [None] * islands  # лучшая за все время особь каждого острова
+    histories = [[] for _ in range(islands)]
+    workers = workers or min(islands, os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_island_worker,
+                             initargs=(products, norms, K)) as executor:
+        done = 0
+        while done < generations:
+            epoch = min(migration_interval, generations - done)
+            results = list(executor.map(_evolve_island, pops, fits, states,
+                                        [pop_size] * islands, [epoch] * islands, bests))
+            for i, (pop, fitnesses, state, history, best) in enumerate(results):
+                pops[i], fits[i], states[i], bests[i] = pop, fitnesses, state, best
+                histories[i].extend(history)
+            done += epoch
+
+            # Миграция: лучшие особи острова i замещают худших на острове i+1
+            if islands > 1 and done < generations:
+                emigrants = []
+                for pop, fitnesses in zip(pops, fits):
+                    best = np.argsort(fitnesses, kind="stable")[:migrants]
+                    emigrants.append([(pop[j].copy(), fitnesses[j]) for j in best])
+                for i in range(islands):
+                    target = (i + 1) % islands
+                    worst = np.argsort(fits[target], kind="stable")[::-1][:migrants]
+                    for j, (chrom, fitness) in zip(worst, emigrants[i]):
+                        pops[target][j] = chrom
+                        fits[target][j] = fitness
+
+    # Лучшее решение — лучшая за все время особь среди всех островов
+    # (без элитизма финальные популяции могут быть хуже найденного ранее)
+    best_solution = min(bests, key=lambda best: best[1])[0]
+    best_scores = [min(values) for values in zip(*histories)]
+    return best_solution, best_scores, histories
+
 # ПОЛНЫЙ ПЕРЕБОР (для сравнения)
 def brute_force():
     """
@@ -174,18 +823,126 @@ def brute_force():
             best_sol = comb
     return best_sol, best_cost
 
-# Запускаем генетический алгоритм и полный перебор
-best_ga, scores = genetic_algorithm(generations=200, pop_size=100)
-best_brute, brute_cost = brute_force()
-
-# Выводим результаты
-print("Лучшее решение (ГА):", [products[i][0] for i in best_ga], "стоимость:", evaluate(best_ga))
-print("Лучшее решение (перебор):", [products[i][0] for i in best_brute], "стоимость:", brute_cost)
-
-# График сходимости ГА
-plt.plot(scores)
-plt.title("Сходимость генетического алгоритма")
-plt.xlabel("Поколение")
-plt.ylabel("Значение функции приспособленности")
-plt.grid(True)
-plt.show()
+# ТОЧНЫЙ МЕТОД ВЕТВЕЙ И ГРАНИЦ
+
+def _suffix_bounds(values, k):
+    """
+    Для каждого суффикса values[p:] и каждого r <= k считает суммы
+    r наименьших и r наибольших значений в каждом столбце.
+    Возвращает два массива формы (n+1, k+1, число столбцов).
+    """
+    n, cols = values.shape
+    min_sums = np.zeros((n + 1, k + 1, cols))
+    max_sums = np.zeros((n + 1, k + 1, cols))
+    smallest = np.empty((0, cols))
+    largest = np.empty((0, cols))
+    for p in range(n - 1, -1, -1):
+        row = values[p:p + 1]
+        smallest = np.sort(np.vstack([smallest, row]), axis=0)[:k]
+        largest = -np.sort(-np.vstack([largest, row]), axis=0)[:k]
+        count = smallest.shape[0]
+        min_sums[p, 1:count + 1] = np.cumsum(smallest, axis=0)
+        max_sums[p, 1:count + 1] = np.cumsum(largest, axis=0)
+    return min_sums, max_sums
+
+def branch_and_bound(time_budget=None, progress=None, progress_interval=1.0):
+    """
+    Точный метод ветвей и границ (замена полного перебора для больших N).
+    Продукты перебираются по возрастанию цены; ветвь отсекается, если
+    нижняя оценка стоимости плюс штрафа (дешевейшие оставшиеся продукты и
+    интервал достижимых сумм характеристик) хуже уже найденного рациона.
+    time_budget — ограничение по времени в секундах (None — без ограничения),
+    progress — функция, которой раз в progress_interval секунд передается статистика.
+    Возвращает (решение, стоимость, статистика), решение совпадает с brute_force().
+    """
+    order = np.argsort(products_matrix[:, M], kind="stable")  # дешевые продукты первыми
+    values = products_matrix[order]
+    nutrients, costs = values[:, :M], values[:, M]
+    min_sums, max_sums = _suffix_bounds(values, K)
+
+    stats = {"explored": 0, "pruned": 0, "elapsed": 0.0, "complete": True}
+    best = {"cost": float("inf"), "solution": None}
+    start = time.perf_counter()
+    last_report = start
+
+    def search(p, chosen, cost, partial):
+        nonlocal last_report
+        now = time.perf_counter()
+        stats["elapsed"] = now - start
+        if time_budget is not None and stats["elapsed"] > time_budget:
+            stats["complete"] = False
+            return
+        if progress is not None and now - last_report >= progress_interval:
+            last_report = now
+            progress(dict(stats, best_cost=best["cost"]))
+        stats["explored"] += 1
+
+        rest = K - len(chosen) - 1  # сколько продуктов останется выбрать после текущего
+        cand = np.arange(p, N - rest)
+        if len(cand) == 0:
+            return
+        # Нижние оценки для всех кандидатов на текущую позицию сразу
+        lb_cost = cost + costs[cand] + min_sums[cand + 1, rest, M]
+        low = partial + nutrients[cand] + min_sums[cand + 1, rest, :M]
+        high = partial + nutrients[cand] + max_sums[cand + 1, rest, :M]
+        penalty = np.maximum(norms_low - high, 0) + np.maximum(low - norms_high, 0)
+        bounds = lb_cost + penalty.sum(axis=1)
+
+        if rest == 0:
+            # Листья: оценка точная, среди равных берем лексикографически первый рацион
+            stats["explored"] += len(cand)
+            value = bounds.min()
+            if value > best["cost"]:
+                return
+            for i in cand[bounds == value]:
+                solution = tuple(sorted(int(order[j]) for j in chosen + [i]))
+                if value < best["cost"] or solution < best["solution"]:
+                    best["cost"], best["solution"] = float(value), solution
+            return
+
+        for pos, i in enumerate(cand):
+            if lb_cost[pos] > best["cost"]:
+                # Цена кандидатов дальше только растет — отсекаем все оставшиеся ветви
+                stats["pruned"] += len(cand) - pos
+                break
+            if bounds[pos] > best["cost"]:
+                stats["pruned"] += 1
+                continue
+            search(i + 1, chosen + [i], cost + costs[i], partial + nutrients[i])
+            if not stats["complete"]:
+                return
+
+    search(0, [], 0.0, np.zeros(M))
+    stats["elapsed"] = time.perf_counter() - start
+    return best["solution"], best["cost"], stats
+
+def main():
+    """Демонстрация: ГА, полный перебор, ветви и границы, островная модель и график сходимости."""
+    # Запускаем генетический алгоритм и полный перебор
+    cache = FitnessCache()
+    best_ga, scores = genetic_algorithm(generations=200, pop_size=100, cache=cache)
+    best_brute, brute_cost = brute_force()
+    best_bnb, bnb_cost, bnb_stats = branch_and_bound()
+    best_islands, island_scores, island_histories = island_genetic_algorithm(generations=200, pop_size=100)
+
+    # Выводим результаты
+    print("Лучшее решение (ГА):", [products[i][0] for i in best_ga], "стоимость:", evaluate(best_ga))
+    print("Кэш функции приспособленности:", cache.stats())
+    print("Лучшее решение (островная модель):", [products[i][0] for i in best_islands],
+          "стоимость:", evaluate(best_islands))
+    print("Лучшее решение (перебор):", [products[i][0] for i in best_brute], "стоимость:", brute_cost)
+    print("Лучшее решение (ветви и границы):", [products[i][0] for i in best_bnb], "стоимость:", bnb_cost,
+          f"(узлов: {bnb_stats['explored']}, отсечено: {bnb_stats['pruned']})")
+
+    # График сходимости ГА; matplotlib загружается только здесь,
+    # чтобы импорт модуля (в том числе в рабочих процессах) оставался быстрым
+    import matplotlib.pyplot as plt
+    plt.plot(scores)
+    plt.title("Сходимость генетического алгоритма")
+    plt.xlabel("Поколение")
+    plt.ylabel("Значение функции приспособленности")
+    plt.grid(True)
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+'''Подбор параметров генетического алгоритма из main.py.
+
+Скрипт перебирает параметры genetic_algorithm(), включая адаптивный выбор
+и постоянные веса кроссоверов и мутаций (сетка или случайный поиск
+по значениям, заданным списками), для нескольких зерен, выполняет запуски
+в пуле процессов и сохраняет результат каждого запуска на диск под ключом
+«хэш параметров + отпечаток каталога», поэтому повторный подбор пропускает
+уже выполненные запуски. Каждый запуск останавливается, как только найден
+точный оптимум (метод ветвей и границ), так что число вычислений функции
+приспособленности — цена нахождения оптимума. В итоге печатается
+Парето-фронт «число вычислений — стоимость» и самая дешевая конфигурация,
+которая находит оптимум при всех зернах.
+
+Пример:
+    python sweep.py --generations 50 100 200 --pop-size 20 50 100 --adaptive 0 1 --seeds 5
+    python sweep.py --size 60:4:5 --random 20 --workers 4 --json sweep.json
+    python sweep.py --adaptive 0 --crossovers 1:1:1 1:0:0 0:0:1 --mutations 1:1:1 0:1:0
+'''
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import main as diet
+from benchmark import synthetic_catalog, write_results, parse_size
+
+# Перебираемые параметры genetic_algorithm() (кроме seed); crossovers и mutations —
+# постоянные веса операторов строкой "w1:w2:w3" (None — равновероятный выбор)
+PARAMETERS = ["generations", "pop_size", "adaptive", "stagnation", "crossovers", "mutations"]
+
+
+def parse_weights(text):
+    """Проверяет веса операторов в формате w1:w2:w3 (по одному на оператор)."""
+    try:
+        weights = [float(w) for w in text.split(":")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"веса должны быть числами: {text}")
+    if len(weights) != 3 or min(weights) < 0 or sum(weights) <= 0:
+        raise argparse.ArgumentTypeError(f"нужно 3 неотрицательных веса с положительной суммой: {text}")
+    return text
+
+
+def _weights(text):
+    return [float(w) for w in text.split(":")] if text else None
+
+
+def catalog_fingerprint():
+    """Отпечаток текущего каталога: матрица продуктов, нормы и K."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(diet.products_matrix, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(diet.norms_low, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(diet.norms_high, dtype=float).tobytes())
+    digest.update(str((diet.N, diet.M, diet.K)).encode())
+    return digest.hexdigest()[:16]
+
+
+def trial_key(params, fingerprint):
+    """Ключ запуска в кэше: хэш параметров (включая seed) и отпечатка каталога."""
+    text = json.dumps(params, sort_keys=True) + fingerprint
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+
+def grid_trials(space, seeds):
+    """Все сочетания значений space (имя -> список значений) для каждого зерна."""
+    names = sorted(space)
+    return [dict(zip(names, values), seed=seed)
+            for values in itertools.product(*(space[name] for name in names))
+            for seed in seeds]
+
+
+def random_trials(space, count, seeds, search_seed=0):
+    """count случайных различных сочетаний значений space, каждое — для всех зерен."""
+    rng = random.Random(search_seed)
+    names = sorted(space)
+    total = 1
+    for name in names:
+        total *= len(space[name])
+    chosen = []
+    while len(chosen) < min(count, total):
+        values = tuple(rng.choice(space[name]) for name in names)
+        if values not in chosen:
+            chosen.append(values)
+    return [dict(zip(names, values), seed=seed) for values in chosen for seed in seeds]
+
+
+def drop_redundant(trials):
+    """
+    При адаптивном выборе операторов постоянные веса не используются: такие запуски
+    приводятся к весам None, повторы отбрасываются (порядок сохраняется).
+    """
+    unique = {}
+    for params in trials:
+        if params.get("adaptive"):
+            params = dict(params, crossovers=None, mutations=None)
+        unique.setdefault(json.dumps(params, sort_keys=True), params)
+    return list(unique.values())
+
+
+class ResultCache:
+    """
+    Результаты запусков на диске: по одному JSON-файлу на ключ в каталоге path.
+    Файл записывается во временный и переименовывается, поэтому прерванный
+    подбор не оставляет испорченных записей.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._file(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, record):
+        tmp = self._file(key) + f".{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp, self._file(key))
+
+
+def exact_optimum(cache, fingerprint):
+    """Точный оптимум текущего каталога (методом ветвей и границ, с кэшем на диске)."""
+    key = "optimum-" + fingerprint
+    record = cache.get(key)
+    if record is None:
+        _, cost, stats = diet.branch_and_bound()
+        record = {"optimum": float(cost), "complete": stats["complete"]}
+        cache.put(key, record)
+    return record["optimum"]
+
+
+def _init_worker(catalog, catalog_norms, k):
+    """Передает рабочему процессу каталог и нормы основного процесса."""
+    diet.set_catalog(catalog, catalog_norms, k)
+
+
+def run_trial(params, optimum):
+    """Один запуск ГА с параметрами params; остановка при достижении optimum."""
+    report = {}
+    start = time.perf_counter()
+    solution, _ = diet.genetic_algorithm(params["generations"], params["pop_size"],
+                                         cache=diet.FitnessCache(), seed=params["seed"],
+                                         stagnation=params["stagnation"], target_cost=optimum,
+                                         adaptive=bool(params["adaptive"]), report=report,
+                                         crossover_weights=_weights(params["crossovers"]),
+                                         mutation_weights=_weights(params["mutations"]))
+    cost = float(diet.evaluate(solution))
+    return dict(params,
+                cost=cost,
+                hit=cost <= optimum + 1e-9,
+                evaluations=int(report["evaluations"]),
+                generations_run=report["generations"],
+                stop_reason=report["stop_reason"],
+                wall_time=time.perf_counter() - start)
+
+
+def run_sweep(trials, cache, workers=None):
+    """
+    Выполняет запуски trials, которых еще нет в кэше, в пуле процессов.
+    Возвращает записи всех запусков (из кэша и новые) в порядке trials.
+    """
+    fingerprint = catalog_fingerprint()
+    optimum = exact_optimum(cache, fingerprint)
+    keys = [trial_key(params, fingerprint) for params in trials]
+    records = [cache.get(key) for key in keys]
+    pending = [i for i, record in enumerate(records) if record is None]
+    print(f"Запусков: {len(trials)}, из кэша: {len(trials) - len(pending)}, новых: {len(pending)}")
+
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(diet.products, diet.norms, diet.K)) as executor:
+            futures = {executor.submit(run_trial, trials[i], optimum): i for i in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                record = dict(future.result(), optimum=optimum, catalog=fingerprint)
+                cache.put(keys[i], record)
+                records[i] = record
+                if done % 10 == 0 or done == len(pending):
+                    print(f"  выполнено {done}/{len(pending)}")
+    return records
+
+
+def summarize(records):
+    """
+    Сводка по конфигурациям (параметры без seed): доля запусков, нашедших оптимум,
+    среднее число вычислений и средняя стоимость; отметка pareto — конфигурация
+    не доминируется другой по паре (среднее число вычислений, средняя стоимость).
+    """
+    groups = {}
+    for record in records:
+        config = tuple(record[name] for name in PARAMETERS)
+        groups.setdefault(config, []).append(record)
+
+    rows = []
+    for config, group in groups.items():
+        rows.append(dict(zip(PARAMETERS, config),
+                         runs=len(group),
+                         hit_rate=sum(r["hit"] for r in group) / len(group),
+                         evaluations=float(np.mean([r["evaluations"] for r in group])),
+                         cost=float(np.mean([r["cost"] for r in group])),
+                         wall_time=float(np.mean([r["wall_time"] for r in group]))))
+    rows.sort(key=lambda r: (r["evaluations"], r["cost"]))
+
+    best_cost = float("inf")
+    for row in rows:
+        # при сортировке по числу вычислений конфигурация на фронте,
+        # если она дешевле всех предыдущих
+        row["pareto"] = row["cost"] < best_cost
+        best_cost = min(best_cost, row["cost"])
+    return rows
+
+
+def cheapest_reliable(rows):
+    """Конфигурация с наименьшим средним числом вычислений среди всегда находящих оптимум."""
+    reliable = [row for row in rows if row["hit_rate"] == 1.0]
+    return min(reliable, key=lambda r: r["evaluations"]) if reliable else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Подбор параметров генетического алгоритма")
+    parser.add_argument("--size", type=parse_size, default=None,
+                        help="синтетический каталог N:M:K (по умолчанию — каталог из main.py)")
+    parser.add_argument("--generations", nargs="+", type=int, default=[50, 100, 200])
+    parser.add_argument("--pop-size", nargs="+", type=int, default=[20, 50, 100])
+    parser.add_argument("--adaptive", nargs="+", type=int, choices=[0, 1], default=[0, 1],
+                        help="адаптивный выбор операторов (0 — равновероятный)")
+    parser.add_argument("--stagnation", nargs="+", type=int, default=[0],
+                        help="поколений без улучшения до остановки (0 — без остановки)")
+    parser.add_argument("--crossovers", nargs="+", type=parse_weights, default=None,
+                        help="веса кроссоверов one_point:two_point:uniform (по умолчанию — равновероятно)")
+    parser.add_argument("--mutations", nargs="+", type=parse_weights, default=None,
+                        help="веса мутаций swap:replace:shuffle (по умолчанию — равновероятно)")
+    parser.add_argument("--seeds", type=int, default=5, help="число зерен на конфигурацию")
+    parser.add_argument("--random", type=int, default=None,
+                        help="случайный поиск: число конфигураций вместо полной сетки")
+    parser.add_argument("--search-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache", default="sweep_cache", help="каталог кэша результатов")
+    parser.add_argument("--json", help="файл для сводки в формате JSON")
+    parser.add_argument("--csv", help="файл для сводки в формате CSV")
+    args = parser.parse_args(argv)
+
+    if args.size is not None:
+        n, m, k = args.size
+        catalog, catalog_norms = synthetic_catalog(n, m, k, seed=args.search_seed)
+        diet.set_catalog(catalog, catalog_norms, k)
+
+    space = {
+        "generations": args.generations,
+        "pop_size": args.pop_size,
+        "adaptive": args.adaptive,
+        "stagnation": [value or None for value in args.stagnation],
+        "crossovers": args.crossovers or [None],
+        "mutations": args.mutations or [None],
+    }
+    seeds = list(range(args.seeds))
+    if args.random:
+        trials = random_trials(space, args.random, seeds, args.search_seed)
+    else:
+        trials = grid_trials(space, seeds)
+    trials = drop_redundant(trials)
+    if not trials:
+        print("Нет запусков: пустая сетка параметров или --seeds 0")
+        return []
+
+    records = run_sweep(trials, ResultCache(args.cache), args.workers)
+    rows = summarize(records)
+
+    print(f"\nОптимум: {records[0]['optimum']:.2f}")
+    print(f"{'поколений':>9} {'популяция':>9} {'адапт.':>6} {'застой':>6} {'кроссоверы':>10} "
+          f"{'мутации':>10} {'оптимум':>8} {'вычислений':>10} {'стоимость':>10}  Парето")
+    for row in rows:
+        print(f"{row['generations']:>9} {row['pop_size']:>9} {row['adaptive']:>6} "
+              f"{str(row['stagnation'] or '-'):>6} {row['crossovers'] or '-':>10} {row['mutations'] or '-':>10} "
+              f"{row['hit_rate']:>8.0%} {row['evaluations']:>10.0f} "
+              f"{row['cost']:>10.2f}  {'*' if row['pareto'] else ''}")
+
+    best = cheapest_reliable(rows)
+    if best is None:
+        print("\nНи одна конфигурация не находит оптимум при всех зернах")
+    else:
+        print(f"\nСамая дешевая надежная конфигурация: generations={best['generations']}, "
+              f"pop_size={best['pop_size']}, adaptive={best['adaptive']}, "
+              f"stagnation={best['stagnation']}, crossovers={best['crossovers']}, "
+              f"mutations={best['mutations']} ({best['evaluations']:.0f} вычислений в среднем)")
+    write_results(rows, args.json, args.csv)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
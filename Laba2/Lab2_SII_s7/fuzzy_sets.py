@@ -0,0 +1,44 @@
+from functools import reduce
+
+import numpy as np
+from membership import get_mf
+
+# Векторные операции над нечеткими множествами:
+# функции принимают массивы NumPy и обрабатывают все значения за один вызов
+
+
+# Трапециевидная функция принадлежности для массива значений
+
+def trapezoidal_mf_array(x, a, b, c, d):
+    """
+    Векторный аналог trapezoidal_mf(): результат совпадает поточечно,
+    включая точки x == a, b, c, d и вырожденные трапеции (a == b, c == d).
+    Вычислитель берется из общего реестра функций принадлежности.
+    """
+    return get_mf("trapezoidal", a, b, c, d)(x)
+
+
+# Операции над нечеткими множествами (значения принадлежности)
+
+def fuzzy_union(*memberships):
+    """Объединение: поточечный максимум степеней принадлежности."""
+    return reduce(np.maximum, [np.asarray(mu, dtype=float) for mu in memberships])
+
+
+def fuzzy_intersection(*memberships):
+    """Пересечение: поточечный минимум степеней принадлежности."""
+    return reduce(np.minimum, [np.asarray(mu, dtype=float) for mu in memberships])
+
+
+def fuzzy_complement(mu):
+    """Дополнение: 1 - μ(x)."""
+    return 1.0 - np.asarray(mu, dtype=float)
+
+
+def alpha_cut(mu, alpha, strong=False):
+    """
+    α-срез: маска значений, степень принадлежности которых не меньше alpha
+    (strong=True — строго больше alpha).
+    """
+    mu = np.asarray(mu, dtype=float)
+    return mu > alpha if strong else mu >= alpha
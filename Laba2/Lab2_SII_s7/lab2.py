@@ -1,18 +1,15 @@
+import argparse
+import sys
+import time
+
 import numpy as np
-import matplotlib.pyplot as plt
+from fuzzy_sets import trapezoidal_mf_array, fuzzy_union
+from membership import get_mf
 
 # Трапециевидная функция принадлежности
 
 def trapezoidal_mf(x, a, b, c, d):
-    if x <= a or x >= d:
-        return 0.0
-    elif a < x < b:
-        return (x - a) / (b - a)
-    elif b <= x <= c:
-        return 1.0
-    elif c < x < d:
-        return (d - x) / (d - c)
-    return 0.0
+    return get_mf("trapezoidal", a, b, c, d).scalar(x)
 
 # Ввод параметров множества
 def input_trapezoid(name):
@@ -20,31 +17,90 @@ def input_trapezoid(name):
     a, b, c, d = map(float, input().split())
     return (a, b, c, d)
 
-# Основная программа
-if __name__ == "__main__":
-    print("Предметная область: Энергопотребление\n")
+# Степени принадлежности и их объединение для массива значений
+def union_table(x, A_params, B_params):
+    muA = trapezoidal_mf_array(x, *A_params)
+    muB = trapezoidal_mf_array(x, *B_params)
+    return muA, muB, fuzzy_union(muA, muB)
 
-    # Параметры множеств
-    A_params = input_trapezoid("A (Уровень потребления энергии)")
-    B_params = input_trapezoid("B (Энергоэффективность)")
+# Потоковое чтение значений x частями
+def read_values(stream, chunk_size=1 << 20, binary=False):
+    """
+    Читает значения из двоичного потока частями по ~chunk_size чисел и выдает массивы.
+    Текстовый формат — числа через пробелы или переводы строк,
+    двоичный — подряд идущие float64.
+    """
+    if binary:
+        tail = b""
+        while True:
+            data = stream.read(chunk_size * 8)
+            if not data:
+                break
+            data = tail + data
+            usable = len(data) - len(data) % 8
+            tail = data[usable:]
+            yield np.frombuffer(data[:usable], dtype=np.float64)
+        return
 
-    # Четкие объекты
-    print("Введите значения энергии/эффективности через пробел:")
-    x_values = list(map(float, input().split()))
+    tail = b""
+    while True:
+        data = stream.read(chunk_size * 16)
+        if not data:
+            break
+        data = tail + data
+        # Обрезаем по последнему разделителю, чтобы не разорвать число
+        cut = max(data.rfind(b"\n"), data.rfind(b" "), data.rfind(b"\t"))
+        if cut < 0:
+            tail = data
+            continue
+        data, tail = data[:cut], data[cut + 1:]
+        if data.strip():
+            yield np.fromstring(data.decode("ascii"), sep=" ")
+    if tail.strip():
+        yield np.fromstring(tail.decode("ascii"), sep=" ")
 
-    print("\nРезультаты объединения:")
-    print("x\tμA(x)\tμB(x)\tμA∪B(x)")
-    for x in x_values:
-        muA = trapezoidal_mf(x, *A_params)
-        muB = trapezoidal_mf(x, *B_params)
-        muUnion = max(muA, muB)
-        print(f"{x:.1f}\t{muA:.2f}\t{muB:.2f}\t{muUnion:.2f}")
-
-    # Построение графиков
-    X = np.linspace(min(x_values) - 5, max(x_values) + 5, 500)
-    muA = [trapezoidal_mf(x, *A_params) for x in X]
-    muB = [trapezoidal_mf(x, *B_params) for x in X]
-    muUnion = [max(a, b) for a, b in zip(muA, muB)]
+# Запись части результатов
+CSV_HEADER = "x,muA,muB,muUnion\n"
+
+def write_table(out, x, muA, muB, muUnion, output_format="csv"):
+    """
+    Записывает строки (x, μA, μB, μA∪B) в двоичный поток: "csv" — текст,
+    "bin" — строки из четырех float64 подряд.
+    """
+    table = np.column_stack([x, muA, muB, muUnion])
+    if output_format == "bin":
+        out.write(table.tobytes())
+    else:
+        # Одна операция форматирования на всю часть вместо цикла по строкам
+        line = "%.6g,%.4f,%.4f,%.4f\n"
+        out.write(((line * len(table)) % tuple(table.ravel().tolist())).encode("ascii"))
+
+def process_stream(source, out, A_params, B_params, chunk_size=1 << 20,
+                   input_format="text", output_format="csv"):
+    """
+    Пакетная обработка: читает x из source частями, считает μA, μB и μA∪B
+    и сразу записывает результат в out, не держа весь набор в памяти.
+    Возвращает (число значений, минимум x, максимум x).
+    """
+    count, x_min, x_max = 0, np.inf, -np.inf
+    if output_format == "csv":
+        out.write(CSV_HEADER.encode("ascii"))
+    for x in read_values(source, chunk_size, binary=input_format == "bin"):
+        if not len(x):
+            continue
+        write_table(out, x, *union_table(x, A_params, B_params), output_format=output_format)
+        count += len(x)
+        x_min, x_max = min(x_min, x.min()), max(x_max, x.max())
+    out.flush()
+    return count, x_min, x_max
+
+# Построение графиков
+def plot_sets(A_params, B_params, x_min, x_max):
+    # matplotlib нужен только для графика и загружается при первом построении
+    import matplotlib.pyplot as plt
+
+    X = np.linspace(x_min - 5, x_max + 5, 500)
+    muA, muB, muUnion = union_table(X, A_params, B_params)
 
     plt.plot(X, muA, label="A (Уровень потребления энергии)", linewidth=2)
     plt.plot(X, muB, label="B (Энергоэффективность)", linewidth=2)
@@ -56,3 +112,70 @@ if __name__ == "__main__":
     plt.legend()
     plt.grid(True)
     plt.show()
+
+# Диалоговый режим (ввод с клавиатуры)
+def run_interactive():
+    print("Предметная область: Энергопотребление\n")
+
+    # Параметры множеств
+    A_params = input_trapezoid("A (Уровень потребления энергии)")
+    B_params = input_trapezoid("B (Энергоэффективность)")
+
+    # Четкие объекты
+    print("Введите значения энергии/эффективности через пробел:")
+    x_values = list(map(float, input().split()))
+
+    # Степени принадлежности для всех значений сразу
+    muA, muB, muUnion = union_table(x_values, A_params, B_params)
+
+    print("\nРезультаты объединения:")
+    print("x\tμA(x)\tμB(x)\tμA∪B(x)")
+    for x, a, b, u in zip(x_values, muA, muB, muUnion):
+        print(f"{x:.1f}\t{a:.2f}\t{b:.2f}\t{u:.2f}")
+
+    plot_sets(A_params, B_params, min(x_values), max(x_values))
+
+# Пакетный режим (файл или стандартный ввод)
+def run_batch(args):
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    start = time.perf_counter()
+    try:
+        count, x_min, x_max = process_stream(source, out, args.a, args.b, args.chunk_size,
+                                             args.input_format, args.output_format)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if out is not sys.stdout.buffer:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"Обработано значений: {count} за {elapsed:.2f} с "
+          f"({count / elapsed if elapsed > 0 else 0:.0f} строк/с)", file=sys.stderr)
+    if args.plot and count:
+        plot_sets(args.a, args.b, x_min, x_max)
+
+# Основная программа
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Объединение нечетких множеств A и B. Без параметров --a/--b — диалоговый режим.")
+    parser.add_argument("--a", nargs=4, type=float, metavar=("a", "b", "c", "d"),
+                        help="параметры трапеции множества A")
+    parser.add_argument("--b", nargs=4, type=float, metavar=("a", "b", "c", "d"),
+                        help="параметры трапеции множества B")
+    parser.add_argument("--input", default="-", help="файл со значениями x (- — стандартный ввод)")
+    parser.add_argument("--output", default="-", help="файл результатов (- — стандартный вывод)")
+    parser.add_argument("--input-format", choices=["text", "bin"], default="text")
+    parser.add_argument("--output-format", choices=["csv", "bin"], default="csv")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="значений в одной части")
+    parser.add_argument("--plot", action="store_true", help="построить график после обработки")
+    args = parser.parse_args(argv)
+
+    if args.a is None and args.b is None:
+        run_interactive()
+    elif args.a is None or args.b is None:
+        parser.error("для пакетного режима нужны оба параметра --a и --b")
+    else:
+        run_batch(args)
+
+if __name__ == "__main__":
+    main()
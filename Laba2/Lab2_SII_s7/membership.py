@@ -0,0 +1,213 @@
+import math
+import time
+from bisect import bisect_right
+from functools import lru_cache
+
+import numpy as np
+
+# Библиотека функций принадлежности (используется в Laba2 и Laba3).
+# Каждая функция — объект с параметрами: вызов mf(x) обрабатывает массив NumPy
+# целиком, mf.scalar(x) — быстрый путь для одного числа без NumPy.
+# Laba3 загружает этот файл по относительному пути (fuzzy_inference._load_membership).
+
+
+class MembershipFunction:
+    """Базовый класс функций принадлежности"""
+
+    __slots__ = ()
+
+    def __call__(self, x):
+        raise NotImplementedError
+
+    def scalar(self, x):
+        raise NotImplementedError
+
+
+class Triangular(MembershipFunction):
+    """
+    Треугольная функция (a, b, c): 0 при x <= a, рост до 1 в b, спад до 0 в c.
+    Ветви те же, что в FuzzyLogic.triangular_mf() Laba3.
+    """
+
+    __slots__ = ('a', 'b', 'c')
+
+    def __init__(self, a, b, c):
+        self.a, self.b, self.c = a, b, c
+
+    def __repr__(self):
+        return f"Triangular({self.a}, {self.b}, {self.c})"
+
+    def scalar(self, x):
+        a, b, c = self.a, self.b, self.c
+        if x <= a:
+            return 0.0
+        elif a < x <= b:
+            return (x - a) / (b - a)
+        elif b < x <= c:
+            return (c - x) / (c - b)
+        return 0.0
+
+    def __call__(self, x):
+        # На подъеме (x - a) / (b - a) <= 1 <= (c - x) / (c - b), на спаде наоборот,
+        # поэтому минимум двух наклонов дает те же значения, что и ветви scalar().
+        # fmin пропускает NaN от 0 / 0 в вырожденных треугольниках.
+        a, b, c = self.a, self.b, self.c
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 0:
+            return np.float64(self.scalar(float(x)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mu = (x - a) / (b - a)
+            np.fmin(mu, (c - x) / (c - b), out=mu)
+        np.copyto(mu, 0.0, where=~((x > a) & (x <= c)))
+        return mu
+
+
+class Trapezoidal(MembershipFunction):
+    """
+    Трапециевидная функция (a, b, c, d): 0 при x <= a или x >= d, 1 на [b, c].
+    Ветви те же, что в trapezoidal_mf() Laba2, включая вырожденные трапеции.
+    """
+
+    __slots__ = ('a', 'b', 'c', 'd')
+
+    def __init__(self, a, b, c, d):
+        self.a, self.b, self.c, self.d = a, b, c, d
+
+    def __repr__(self):
+        return f"Trapezoidal({self.a}, {self.b}, {self.c}, {self.d})"
+
+    def scalar(self, x):
+        a, b, c, d = self.a, self.b, self.c, self.d
+        if x <= a or x >= d:
+            return 0.0
+        elif a < x < b:
+            return (x - a) / (b - a)
+        elif b <= x <= c:
+            return 1.0
+        elif c < x < d:
+            return (d - x) / (d - c)
+        return 0.0
+
+    def __call__(self, x):
+        # Минимум подъема, спада и 1 совпадает с ветвями scalar() внутри (a, d)
+        a, b, c, d = self.a, self.b, self.c, self.d
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 0:
+            return np.float64(self.scalar(float(x)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mu = (x - a) / (b - a)
+            np.fmin(mu, (d - x) / (d - c), out=mu)
+        np.minimum(mu, 1.0, out=mu)
+        np.copyto(mu, 0.0, where=~((x > a) & (x < d)))
+        return mu
+
+
+class Gaussian(MembershipFunction):
+    """Гауссова функция exp(-(x - mean)^2 / (2 sigma^2))"""
+
+    __slots__ = ('mean', 'sigma')
+
+    def __init__(self, mean, sigma):
+        if sigma <= 0:
+            raise ValueError("sigma должна быть положительной")
+        self.mean, self.sigma = mean, sigma
+
+    def __repr__(self):
+        return f"Gaussian({self.mean}, {self.sigma})"
+
+    def scalar(self, x):
+        z = (x - self.mean) / self.sigma
+        return math.exp(-0.5 * z * z)
+
+    def __call__(self, x):
+        z = (np.asarray(x, dtype=float) - self.mean) / self.sigma
+        return np.exp(-0.5 * z * z)
+
+
+class PiecewiseLinear(MembershipFunction):
+    """
+    Кусочно-линейная функция по точкам (xs, ys) с возрастающими xs;
+    вне [xs[0], xs[-1]] — значения left и right.
+    """
+
+    __slots__ = ('xs', 'ys', 'left', 'right')
+
+    def __init__(self, xs, ys, left=0.0, right=0.0):
+        if len(xs) != len(ys) or not xs:
+            raise ValueError("xs и ys должны быть непустыми и одной длины")
+        if any(x1 > x2 for x1, x2 in zip(xs, xs[1:])):
+            raise ValueError("xs должны не убывать")
+        self.xs, self.ys = tuple(xs), tuple(ys)
+        self.left, self.right = left, right
+
+    def __repr__(self):
+        return f"PiecewiseLinear({self.xs}, {self.ys}, left={self.left}, right={self.right})"
+
+    def scalar(self, x):
+        xs, ys = self.xs, self.ys
+        if x < xs[0]:
+            return self.left
+        if x > xs[-1]:
+            return self.right
+        i = bisect_right(xs, x) - 1
+        if i >= len(xs) - 1:
+            return float(ys[-1])
+        return ys[i] + (ys[i + 1] - ys[i]) * (x - xs[i]) / (xs[i + 1] - xs[i])
+
+    def __call__(self, x):
+        return np.interp(x, self.xs, self.ys, left=self.left, right=self.right)
+
+
+# Классы по названию вида функции
+KINDS = {
+    'triangular': Triangular,
+    'trapezoidal': Trapezoidal,
+    'gaussian': Gaussian,
+    'piecewise': PiecewiseLinear,
+}
+
+
+@lru_cache(maxsize=1024)
+def get_mf(kind, *params):
+    """
+    Реестр: функция принадлежности вида kind с параметрами params.
+    Для одинаковых параметров возвращается один и тот же объект, поэтому
+    переменные с совпадающими термами используют общий вычислитель.
+    Размер реестра ограничен: параметры из онтологии меняются при каждой
+    правке каталога, и старые функции вытесняются.
+    """
+    return KINDS[kind](*params)
+
+
+def benchmark(n=1_000_000, repeat=3, seed=0):
+    """
+    Сравнение на n точках: поэлементный скалярный путь и векторный вызов.
+    Возвращает {вид: {способ: секунды}}.
+    """
+    x = np.random.default_rng(seed).uniform(-1.0, 11.0, n)
+    values = x.tolist()
+    functions = {
+        'triangular': get_mf('triangular', 1.0, 4.0, 8.0),
+        'trapezoidal': get_mf('trapezoidal', 1.0, 3.0, 6.0, 9.0),
+        'gaussian': get_mf('gaussian', 5.0, 1.5),
+        'piecewise': get_mf('piecewise', (0.0, 2.0, 5.0, 10.0), (0.0, 1.0, 1.0, 0.0)),
+    }
+    results = {}
+    for kind, mf in functions.items():
+        timings = {}
+        for method, run in (('scalar', lambda: [mf.scalar(v) for v in values]),
+                            ('vector', lambda: mf(x))):
+            best = float('inf')
+            for _ in range(repeat if method != 'scalar' else 1):
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+            timings[method] = best
+        results[kind] = timings
+    return results
+
+
+if __name__ == "__main__":
+    for kind, timings in benchmark().items():
+        print(f"{kind}: скалярно {timings['scalar']:.3f} с, вектор {timings['vector']:.4f} с "
+              f"(x{timings['scalar'] / timings['vector']:.0f})")